@@ -7,3 +7,90 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./ai_listener.db")
 SECRET_KEY = os.getenv("SECRET_KEY", "ai-listener-dev-secret-key-2024")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+
+# LLM (Gemini) call limits
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+
+# Gemini response cache (repeat openers like "hi" skip the model round-trip)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_BYPASS_WITH_HISTORY = os.getenv("RESPONSE_CACHE_BYPASS_WITH_HISTORY", "true").lower() == "true"
+
+# "gemini" (default) or "fake" for the local stand-in model used in tests/benchmarks
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+FAKE_LLM_FIRST_CHUNK_DELAY_MS = int(os.getenv("FAKE_LLM_FIRST_CHUNK_DELAY_MS", "200"))
+FAKE_LLM_CHUNK_DELAY_MS = int(os.getenv("FAKE_LLM_CHUNK_DELAY_MS", "30"))
+
+# Per-request budget for waiting on the model before answering rule-based,
+# and the circuit breaker around Gemini calls
+LLM_LATENCY_BUDGET_SECONDS = float(os.getenv("LLM_LATENCY_BUDGET_SECONDS", "8"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+# History sent with each Gemini call: at most this many turns, newest first,
+# within an estimated token budget
+PROMPT_HISTORY_MAX_TURNS = int(os.getenv("PROMPT_HISTORY_MAX_TURNS", "10"))
+PROMPT_HISTORY_TOKEN_BUDGET = int(os.getenv("PROMPT_HISTORY_TOKEN_BUDGET", "1500"))
+
+# Warm per-user chat context kept in memory between requests
+SESSION_POOL_MAX_SESSIONS = int(os.getenv("SESSION_POOL_MAX_SESSIONS", "1000"))
+SESSION_POOL_IDLE_SECONDS = float(os.getenv("SESSION_POOL_IDLE_SECONDS", "1800"))
+SESSION_POOL_MAX_BYTES = int(os.getenv("SESSION_POOL_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Rolling conversation summary: fold older messages in once this many turns
+# have left the prompt's history window (0 disables summaries)
+SUMMARY_EVERY_N_TURNS = int(os.getenv("SUMMARY_EVERY_N_TURNS", "4"))
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "1500"))
+
+# Authenticated identity cache (verified tokens and loaded users)
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "300"))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+
+# bcrypt hashing/verification pool for register and login
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "256"))
+
+# SQLite connection settings (applied to every new connection)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Connection pool for server databases (DATABASE_URL=postgresql://...)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# Write-behind for chat emotion logs and current_mood (off: written in the request)
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "1.0"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "50000"))
+
+# Mood timeline: cache of closed (past) buckets per user and bucket size
+TIMELINE_CACHE_MAX_ENTRIES = int(os.getenv("TIMELINE_CACHE_MAX_ENTRIES", "2000"))
+TIMELINE_CACHE_TTL_SECONDS = float(os.getenv("TIMELINE_CACHE_TTL_SECONDS", "3600"))
+TIMELINE_MAX_BUCKETS = int(os.getenv("TIMELINE_MAX_BUCKETS", "2000"))
+
+# Real-time push (WebSocket): fan-out backend and per-connection event queue
+REALTIME_BACKEND = os.getenv("REALTIME_BACKEND", "memory")
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "256"))
+REALTIME_SSE_KEEPALIVE_SECONDS = float(os.getenv("REALTIME_SSE_KEEPALIVE_SECONDS", "25"))
+
+# Presence: online for this long after the last request (or while connected),
+# with users.is_online updated in bulk every PRESENCE_SWEEP_SECONDS
+PRESENCE_TTL_SECONDS = float(os.getenv("PRESENCE_TTL_SECONDS", "90"))
+PRESENCE_SWEEP_SECONDS = float(os.getenv("PRESENCE_SWEEP_SECONDS", "15"))
+
+# Discover matching: most recent users read per mood/interest index entry
+MATCH_CANDIDATES_PER_KEY = int(os.getenv("MATCH_CANDIDATES_PER_KEY", "1000"))
+
+# "Similar users": emotion profile vectors, where a log's weight halves every this many days
+EMOTION_VECTOR_HALF_LIFE_DAYS = float(os.getenv("EMOTION_VECTOR_HALF_LIFE_DAYS", "30"))
@@ -1,10 +1,22 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import init_db
+from app.database import init_db, async_session
 from app.routes import auth, chat, profile, connections, extras
+from app.services.emotion_service import warm_up_model, llm_stats
+from app.services.session_pool import session_pool
+from app.services.summaries import drain_summary_updates, summary_stats
+from app.services.write_behind import write_behind
+from app.services.mood_timeline import timeline_cache_stats
+from app.services.realtime import hub
+from app.services.presence import presence
+from app.services.matching import match_index
+from app.services.emotion_vectors import emotion_vectors
+from app.utils.auth import auth_cache_stats, password_hashing_stats
+from app.utils.pagination import CURSOR_HEADERS
 
 # Friendly names for validation fields
 FIELD_LABELS = {
@@ -17,7 +29,24 @@ FIELD_LABELS = {
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    async with async_session() as db:
+        await match_index.load(db)
+    # Emotion vectors load in the background; /connect/similar answers 503 until ready
+    await emotion_vectors.start()
+    # Build the LLM client in the background so startup doesn't wait on it
+    warm_up = asyncio.create_task(warm_up_model())
+    await write_behind.start()
+    await hub.start()
+    await presence.start()
     yield
+    # Ends open /ws and /events streams, whose handlers then disconnect from presence
+    await hub.stop()
+    await presence.stop()
+    await emotion_vectors.stop()
+    await warm_up
+    await drain_summary_updates()
+    # Last: stream handlers that finished during shutdown may still queue writes
+    await write_behind.stop()
 
 
 app = FastAPI(
@@ -61,6 +90,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=CURSOR_HEADERS,
 )
 
 app.include_router(auth.router)
@@ -78,3 +108,21 @@ async def root():
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/api/metrics")
+async def metrics():
+    """Runtime counters for monitoring (LLM breaker state, cache hit rates)."""
+    return {
+        "llm": llm_stats(),
+        "chat_sessions": session_pool.stats(),
+        "summaries": summary_stats(),
+        "auth": auth_cache_stats(),
+        "password_hashing": password_hashing_stats(),
+        "write_behind": write_behind.stats(),
+        "mood_timeline_cache": timeline_cache_stats(),
+        "realtime": hub.stats(),
+        "presence": presence.stats(),
+        "matching": match_index.stats(),
+        "emotion_vectors": emotion_vectors.stats(),
+    }
@@ -0,0 +1,121 @@
+"""
+Versioned schema migrations.
+
+init_db creates missing tables with create_all, which never alters tables
+that already exist. Changes to existing tables (new indexes, columns) are
+listed here as numbered steps. Applied versions are recorded in
+schema_migrations and each pending step runs once, in order, at startup
+inside the same transaction as create_all.
+
+Steps receive a synchronous Connection. They are written as plain DDL, not
+against the models, so a step keeps doing the same thing after the models
+move on, and they should be idempotent (IF [NOT] EXISTS) since a fresh
+database already gets the current models from create_all before any step
+runs.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _sql(*statements: str):
+    def apply(conn: Connection) -> None:
+        for statement in statements:
+            conn.execute(text(statement))
+    return apply
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "Indexes for chat history, emotion logs, DMs, connections and discover",
+        _sql(
+            "CREATE INDEX IF NOT EXISTS ix_chat_messages_user_created ON chat_messages (user_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_emotion_logs_user_created ON emotion_logs (user_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_direct_messages_pair_created ON direct_messages (sender_id, receiver_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_user_connections_user_target ON user_connections (user_id, connected_user_id)",
+            "CREATE INDEX IF NOT EXISTS ix_user_connections_target_status ON user_connections (connected_user_id, status)",
+            "CREATE INDEX IF NOT EXISTS ix_users_current_mood ON users (current_mood)",
+        ),
+    ),
+    Migration(
+        2,
+        "Add id to the chat/DM timeline indexes for keyset pagination",
+        _sql(
+            "CREATE INDEX IF NOT EXISTS ix_chat_messages_user_created_id ON chat_messages (user_id, created_at, id)",
+            "DROP INDEX IF EXISTS ix_chat_messages_user_created",
+            "CREATE INDEX IF NOT EXISTS ix_direct_messages_pair_created_id "
+            "ON direct_messages (sender_id, receiver_id, created_at, id)",
+            "DROP INDEX IF EXISTS ix_direct_messages_pair_created",
+        ),
+    ),
+    Migration(
+        3,
+        "Backfill user_emotion_counts from emotion_logs",
+        _sql(
+            "DELETE FROM user_emotion_counts",
+            "INSERT INTO user_emotion_counts (user_id, emotion, count) "
+            "SELECT user_id, emotion, COUNT(*) FROM emotion_logs GROUP BY user_id, emotion",
+        ),
+    ),
+    Migration(
+        4,
+        "Index user_interests by user for profile interest updates",
+        _sql("CREATE INDEX IF NOT EXISTS ix_user_interests_user ON user_interests (user_id)"),
+    ),
+    Migration(
+        5,
+        "Index direct_messages by receiver for the inbox and marking messages read",
+        _sql(
+            "CREATE INDEX IF NOT EXISTS ix_direct_messages_receiver_sender_read "
+            "ON direct_messages (receiver_id, sender_id, is_read)"
+        ),
+    ),
+]
+
+
+def run_migrations(conn: Connection) -> None:
+    """Apply pending migrations; called from init_db via run_sync."""
+    _metadata.create_all(conn)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        migration.apply(conn)
+        conn.execute(
+            schema_migrations.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow(),
+            )
+        )
+
+
+def schema_version(conn: Connection) -> int:
+    _metadata.create_all(conn)
+    return conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version.desc())).scalar() or 0
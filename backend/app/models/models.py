@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text, Boolean, Float, ForeignKey, Integer
+from sqlalchemy import Column, String, DateTime, Text, Boolean, Float, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -22,7 +22,7 @@ class User(Base):
     voice_preference = Column(String(50), default="female-calm")
     theme_preference = Column(String(20), default="dark")
     is_online = Column(Boolean, default=False)
-    current_mood = Column(String(50), nullable=True)
+    current_mood = Column(String(50), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -33,6 +33,9 @@ class User(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_user_created_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -45,8 +48,21 @@ class ChatMessage(Base):
     user = relationship("User", back_populates="messages")
 
 
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    summary = Column(Text, nullable=False)
+    summarized_through = Column(DateTime, nullable=False)  # created_at of the last folded message
+    messages_summarized = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class EmotionLog(Base):
     __tablename__ = "emotion_logs"
+    __table_args__ = (
+        Index("ix_emotion_logs_user_created", "user_id", "created_at"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -58,8 +74,20 @@ class EmotionLog(Base):
     user = relationship("User", back_populates="emotion_logs")
 
 
+class UserEmotionCount(Base):
+    """Running count of EmotionLog rows per (user, emotion), kept in step on every log write."""
+    __tablename__ = "user_emotion_counts"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    emotion = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
 class UserInterest(Base):
     __tablename__ = "user_interests"
+    __table_args__ = (
+        Index("ix_user_interests_user", "user_id"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -70,6 +98,10 @@ class UserInterest(Base):
 
 class UserConnection(Base):
     __tablename__ = "user_connections"
+    __table_args__ = (
+        Index("ix_user_connections_user_target", "user_id", "connected_user_id"),
+        Index("ix_user_connections_target_status", "connected_user_id", "status"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -81,6 +113,10 @@ class UserConnection(Base):
 
 class DirectMessage(Base):
     __tablename__ = "direct_messages"
+    __table_args__ = (
+        Index("ix_direct_messages_pair_created_id", "sender_id", "receiver_id", "created_at", "id"),
+        Index("ix_direct_messages_receiver_sender_read", "receiver_id", "sender_id", "is_read"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     sender_id = Column(String, ForeignKey("users.id"), nullable=False)
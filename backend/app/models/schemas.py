@@ -40,6 +40,7 @@ class ProfileUpdate(BaseModel):
     voice_preference: Optional[str] = None
     theme_preference: Optional[str] = None
     current_mood: Optional[str] = None
+    interests: Optional[list[str]] = Field(None, max_length=20)  # replaces the whole list
 
 
 class UserProfile(BaseModel):
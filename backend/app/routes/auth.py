@@ -4,7 +4,8 @@ from sqlalchemy import select
 from app.database import get_db
 from app.models.models import User
 from app.models.schemas import UserRegister, UserLogin, TokenResponse
-from app.utils.auth import hash_password, verify_password, create_access_token
+from app.utils.auth import hash_password_async, verify_password_async, create_access_token
+from app.services.matching import match_index
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -24,12 +25,13 @@ async def register(data: UserRegister, db: AsyncSession = Depends(get_db)):
     user = User(
         username=data.username,
         email=data.email,
-        password_hash=hash_password(data.password),
+        password_hash=await hash_password_async(data.password),
         display_name=data.display_name or data.username,
     )
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    match_index.add_user(user.id)
 
     token = create_access_token({"sub": user.id})
     return TokenResponse(
@@ -49,7 +51,7 @@ async def register(data: UserRegister, db: AsyncSession = Depends(get_db)):
 async def login(data: UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == data.email))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(data.password, user.password_hash):
+    if not user or not await verify_password_async(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     token = create_access_token({"sub": user.id})
@@ -1,49 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from app.database import get_db
-from app.models.models import User, ChatMessage, EmotionLog
+from sqlalchemy import select, desc, update
+from app.database import get_db, async_session
+from app.models.models import User, ChatMessage, EmotionLog, generate_uuid
 from app.models.schemas import ChatInput, ProfileUpdate, EmotionLogCreate
-from app.utils.auth import get_current_user
-from app.services.emotion_service import generate_response
+from app.utils.auth import get_current_user, get_current_user_id, invalidate_user
+from app.utils.pagination import fetch_page
+from app.services.emotion_service import generate_response_async, stream_response_async
+from app.services.session_pool import session_pool
+from app.services.summaries import load_summary, schedule_summary_update
+from app.services.write_behind import write_behind
+from app.services.emotion_counts import increment_emotion_counts
+from app.services.matching import match_index
+from app.services.emotion_vectors import emotion_vectors
+from app.config import PROMPT_HISTORY_MAX_TURNS
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
 
-@router.post("/send")
-async def send_message(
-    data: ChatInput,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    # Fetch recent history for context
+async def _load_history(db: AsyncSession, user_id: str) -> tuple[list[dict], str | None]:
+    # Recent history and rolling summary for context, from the warm session
+    # pool when possible
+    warm = session_pool.get(user_id)
+    if warm is not None:
+        return warm
+
     history_result = await db.execute(
         select(ChatMessage)
-        .where(ChatMessage.user_id == current_user.id)
+        .where(ChatMessage.user_id == user_id)
         .order_by(desc(ChatMessage.created_at))
-        .limit(10)
+        .limit(PROMPT_HISTORY_MAX_TURNS)
     )
     history_msgs = history_result.scalars().all()
     history = [
         {"content": m.content, "is_ai_response": m.is_ai_response}
         for m in reversed(history_msgs)
     ]
+    summary = await load_summary(db, user_id)
+    session_pool.put(user_id, history, summary)
+    return history, summary
+
 
-    ai_result = generate_response(data.message, history)
+def _remember_turn(user_id: str, message: str, ai_result: dict) -> None:
+    """Append a saved turn to the user's warm session and refresh the summary if due."""
+    session_pool.append(user_id, message, False)
+    session_pool.append(user_id, ai_result["response"], True)
+    schedule_summary_update(user_id)
+
+
+def _add_turn(
+    db: AsyncSession, user_id: str, message: str, ai_result: dict
+) -> tuple[ChatMessage, ChatMessage, EmotionLog | None]:
+    """
+    Stage the user message, AI response and emotion log for one chat turn.
+    Ids and timestamps are assigned here rather than by column defaults at
+    flush, so the response can be built without reading the rows back.
+    With write-behind on, the emotion log is queued by _queue_emotion
+    instead and None is returned in its place.
+    """
+    now = datetime.utcnow()
 
     # Save user message
     user_msg = ChatMessage(
-        user_id=current_user.id,
-        content=data.message,
+        id=generate_uuid(),
+        created_at=now,
+        user_id=user_id,
+        content=message,
         is_ai_response=False,
         emotion_detected=ai_result["emotion"],
         sentiment_score=ai_result["sentiment_score"],
     )
     db.add(user_msg)
 
-    # Save AI response
+    # Save AI response (a microsecond later, so it always sorts after the message)
     ai_msg = ChatMessage(
-        user_id=current_user.id,
+        id=generate_uuid(),
+        created_at=now + timedelta(microseconds=1),
+        user_id=user_id,
         content=ai_result["response"],
         is_ai_response=True,
         emotion_detected=ai_result["emotion"],
@@ -52,21 +88,33 @@ async def send_message(
     db.add(ai_msg)
 
     # Log emotion
-    emotion_log = EmotionLog(
-        user_id=current_user.id,
-        emotion=ai_result["emotion"],
-        intensity=ai_result["confidence"],
-        note=data.message[:200],
-    )
-    db.add(emotion_log)
+    log = None
+    if not write_behind.enabled:
+        log = EmotionLog(**_emotion_log_row(user_id, message, ai_result, now))
+        db.add(log)
+    return user_msg, ai_msg, log
 
-    # Update user mood
-    current_user.current_mood = ai_result["emotion"]
 
-    await db.commit()
-    await db.refresh(user_msg)
-    await db.refresh(ai_msg)
+def _emotion_log_row(user_id: str, message: str, ai_result: dict, created_at: datetime) -> dict:
+    return {
+        "id": generate_uuid(),
+        "created_at": created_at,
+        "user_id": user_id,
+        "emotion": ai_result["emotion"],
+        "intensity": ai_result["confidence"],
+        "note": message[:200],
+    }
 
+
+def _queue_emotion(user_msg: ChatMessage, ai_result: dict) -> None:
+    """Hand a committed turn's emotion log and mood update to the write-behind buffer."""
+    write_behind.add_emotion_log(
+        _emotion_log_row(user_msg.user_id, user_msg.content, ai_result, user_msg.created_at)
+    )
+    write_behind.set_mood(user_msg.user_id, ai_result["emotion"])
+
+
+def _turn_payload(user_msg: ChatMessage, ai_msg: ChatMessage, ai_result: dict) -> dict:
     return {
         "user_message": {
             "id": user_msg.id,
@@ -85,22 +133,125 @@ async def send_message(
     }
 
 
-@router.get("/history")
-async def get_chat_history(
-    limit: int = 50,
-    offset: int = 0,
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/send")
+async def send_message(
+    data: ChatInput,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Retrieve chat history for the current user."""
-    result = await db.execute(
-        select(ChatMessage)
-        .where(ChatMessage.user_id == current_user.id)
-        .order_by(desc(ChatMessage.created_at))
-        .offset(offset)
-        .limit(limit)
+    history, summary = await _load_history(db, current_user.id)
+
+    ai_result = await generate_response_async(data.message, history, summary)
+
+    user_msg, ai_msg, log = _add_turn(db, current_user.id, data.message, ai_result)
+
+    # Update user mood
+    if not write_behind.enabled:
+        current_user.current_mood = ai_result["emotion"]
+        await increment_emotion_counts(db, [(current_user.id, ai_result["emotion"])])
+
+    await db.commit()
+    if write_behind.enabled:
+        _queue_emotion(user_msg, ai_result)
+    else:
+        invalidate_user(current_user.id)
+        emotion_vectors.record(log.id, log.user_id, log.emotion, log.intensity, log.created_at)
+    match_index.set_mood(current_user.id, ai_result["emotion"])
+    _remember_turn(current_user.id, data.message, ai_result)
+
+    return _turn_payload(user_msg, ai_msg, ai_result)
+
+
+@router.post("/stream")
+async def stream_message(
+    data: ChatInput,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Server-sent events variant of /send.
+    Emits `token` events ({"text": ...}) as the reply is generated, a `meta`
+    event with emotion/confidence/sentiment_score/coping_tip, and a final
+    `done` event with the same body /send returns once the turn is saved.
+    """
+    history, summary = await _load_history(db, current_user.id)
+    user_id = current_user.id
+
+    async def event_stream():
+        ai_result = None
+        async for kind, payload in stream_response_async(data.message, history, summary):
+            if kind == "token":
+                yield _sse("token", {"text": payload})
+            else:
+                ai_result = payload
+
+        yield _sse("meta", {
+            "emotion": ai_result["emotion"],
+            "confidence": ai_result["confidence"],
+            "sentiment_score": ai_result["sentiment_score"],
+            "coping_tip": ai_result["coping_tip"],
+            "is_crisis": ai_result["is_crisis"],
+        })
+
+        # The request-scoped session may already be closed while streaming
+        async with async_session() as session:
+            user_msg, ai_msg, log = _add_turn(session, user_id, data.message, ai_result)
+            if not write_behind.enabled:
+                await session.execute(
+                    update(User).where(User.id == user_id).values(current_mood=ai_result["emotion"])
+                )
+                await increment_emotion_counts(session, [(user_id, ai_result["emotion"])])
+            await session.commit()
+        if write_behind.enabled:
+            _queue_emotion(user_msg, ai_result)
+        else:
+            invalidate_user(user_id)
+            emotion_vectors.record(log.id, log.user_id, log.emotion, log.intensity, log.created_at)
+        match_index.set_mood(user_id, ai_result["emotion"])
+        _remember_turn(user_id, data.message, ai_result)
+
+        yield _sse("done", _turn_payload(user_msg, ai_msg, ai_result))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    messages = result.scalars().all()
+
+
+@router.get("/history")
+async def get_chat_history(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    after: str | None = None,
+    offset: int | None = Query(None, ge=0, deprecated=True),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """
+    Retrieve chat history for the current user, oldest first.
+    Paged with the X-Before-Cursor / X-After-Cursor response headers.
+
+    `offset` (skip that many of the newest messages) still works for older
+    clients but is deprecated: deep pages scan every skipped row, and
+    messages arriving between calls shift the pages.
+    """
+    query = select(ChatMessage).where(ChatMessage.user_id == current_user_id)
+    if offset is not None:
+        if before or after:
+            raise HTTPException(status_code=400, detail="Use either offset or before/after cursors, not both")
+        response.headers["Deprecation"] = "true"
+        result = await db.execute(
+            query.order_by(desc(ChatMessage.created_at), desc(ChatMessage.id)).offset(offset).limit(limit)
+        )
+        messages = list(reversed(result.scalars().all()))
+    else:
+        messages = await fetch_page(db, query, ChatMessage, response, limit, before, after)
     return [
         {
             "id": m.id,
@@ -110,5 +261,5 @@ async def get_chat_history(
             "sentiment_score": m.sentiment_score,
             "created_at": str(m.created_at),
         }
-        for m in reversed(messages)
+        for m in messages
     ]
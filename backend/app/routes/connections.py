@@ -1,27 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import hashlib
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, desc
+from sqlalchemy import select, update, or_, and_, case, func, literal, union_all
 from app.database import get_db
 from app.models.models import User, UserConnection, DirectMessage
 from app.models.schemas import ConnectionRequest, DirectMessageCreate
-from app.utils.auth import get_current_user
+from app.utils.auth import get_current_user, get_current_user_id, user_id_for_token
+from app.utils.pagination import NEXT_HEADER, fetch_page
+from app.services.realtime import hub
+from app.services.presence import presence
+from app.services.matching import decode_match_cursor, encode_match_cursor, match_index
+from app.services.emotion_vectors import emotion_vectors
+from app.config import REALTIME_SSE_KEEPALIVE_SECONDS
 
 router = APIRouter(prefix="/api/connect", tags=["Connections"])
 
+async def _connected_user_ids(db: AsyncSession, user_id: str) -> set[str]:
+    """Everyone the user has a connection or request with, in either direction."""
+    result = await db.execute(
+        select(UserConnection.user_id, UserConnection.connected_user_id).where(
+            or_(
+                UserConnection.user_id == user_id,
+                UserConnection.connected_user_id == user_id,
+            )
+        )
+    )
+    return {a if a != user_id else b for a, b in result.all()}
+
 
 @router.get("/discover")
 async def discover_users(
+    response: Response,
     mood: str = None,
+    limit: int = Query(20, ge=1, le=50),
+    cursor: str | None = None,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
-    """Find users to connect with, optionally filtered by mood."""
-    query = select(User).where(User.id != current_user.id)
-    if mood:
-        query = query.where(User.current_mood == mood)
-    query = query.limit(20)
-    result = await db.execute(query)
-    users = result.scalars().all()
+    """
+    People to connect with, best match first: shared mood and shared
+    interests raise the score, and online users come first among equal
+    scores. Optionally only users in `mood`.
+    Excludes anyone you already have a connection or request with. Pass the
+    X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    connected = await _connected_user_ids(db, current_user_id)
+    after = decode_match_cursor(cursor) if cursor else None
+    page, next_after = match_index.rank(current_user_id, connected, mood, after, limit)
+    if next_after is not None:
+        response.headers[NEXT_HEADER] = encode_match_cursor(*next_after)
+    if not page:
+        return []
+
+    result = await db.execute(select(User).where(User.id.in_([user_id for _, user_id, _ in page])))
+    users = {u.id: u for u in result.scalars().all()}
     return [
         {
             "id": u.id,
@@ -30,9 +65,50 @@ async def discover_users(
             "avatar_url": u.avatar_url,
             "current_mood": u.current_mood,
             "bio": u.bio,
-            "is_online": u.is_online,
+            "is_online": presence.is_online(u.id),
+            "match_score": score,
+            "shared_interests": shared,
         }
-        for u in users
+        for score, user_id, shared in page
+        if (u := users.get(user_id)) is not None
+    ]
+
+
+@router.get("/similar")
+async def similar_users(
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """
+    People who feel like you: the closest emotion profiles (how often and
+    how strongly each emotion was logged, recent logs weighing more), by
+    cosine similarity. Excludes anyone you already have a connection or
+    request with. Empty until you have logged an emotion.
+    """
+    if not emotion_vectors.ready:
+        raise HTTPException(status_code=503, detail="Similar users are still loading, try again shortly")
+    connected = await _connected_user_ids(db, current_user_id)
+    page = emotion_vectors.similar_users(current_user_id, connected, limit)
+    if not page:
+        return []
+
+    result = await db.execute(select(User).where(User.id.in_([user_id for user_id, _ in page])))
+    users = {u.id: u for u in result.scalars().all()}
+    return [
+        {
+            "id": u.id,
+            "username": u.username,
+            "display_name": u.display_name,
+            "avatar_url": u.avatar_url,
+            "current_mood": u.current_mood,
+            "bio": u.bio,
+            "is_online": presence.is_online(u.id),
+            "similarity": round(similarity, 4),
+            "emotion_profile": emotion_vectors.profile(u.id),
+        }
+        for user_id, similarity in page
+        if (u := users.get(user_id)) is not None
     ]
 
 
@@ -72,6 +148,17 @@ async def send_connection_request(
     )
     db.add(conn)
     await db.commit()
+    await hub.publish(conn.connected_user_id, "connection_request", {
+        "connection_id": conn.id,
+        "user": {
+            "id": current_user.id,
+            "username": current_user.username,
+            "display_name": current_user.display_name,
+            "current_mood": current_user.current_mood,
+        },
+        "matched_on": conn.matched_on,
+        "created_at": str(conn.created_at),
+    })
     return {"message": "Connection request sent", "id": conn.id}
 
 
@@ -79,12 +166,12 @@ async def send_connection_request(
 async def accept_connection(
     connection_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
     result = await db.execute(
         select(UserConnection).where(
             UserConnection.id == connection_id,
-            UserConnection.connected_user_id == current_user.id,
+            UserConnection.connected_user_id == current_user_id,
         )
     )
     conn = result.scalar_one_or_none()
@@ -92,19 +179,23 @@ async def accept_connection(
         raise HTTPException(status_code=404, detail="Connection request not found")
     conn.status = "accepted"
     await db.commit()
+    # Tell the requester, and the accepter's other tabs (their pending list shrank)
+    accepted = {"connection_id": conn.id, "user_id": conn.user_id, "connected_user_id": conn.connected_user_id}
+    await hub.publish(conn.user_id, "connection_accepted", accepted)
+    await hub.publish(current_user_id, "connection_accepted", accepted)
     return {"message": "Connection accepted"}
 
 
 @router.get("/my-connections")
 async def get_connections(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
     result = await db.execute(
         select(UserConnection).where(
             or_(
-                UserConnection.user_id == current_user.id,
-                UserConnection.connected_user_id == current_user.id,
+                UserConnection.user_id == current_user_id,
+                UserConnection.connected_user_id == current_user_id,
             ),
             UserConnection.status == "accepted",
         )
@@ -112,7 +203,7 @@ async def get_connections(
     connections = result.scalars().all()
     connected_ids = []
     for c in connections:
-        other_id = c.connected_user_id if c.user_id == current_user.id else c.user_id
+        other_id = c.connected_user_id if c.user_id == current_user_id else c.user_id
         connected_ids.append(other_id)
 
     if not connected_ids:
@@ -127,7 +218,7 @@ async def get_connections(
             "display_name": u.display_name,
             "avatar_url": u.avatar_url,
             "current_mood": u.current_mood,
-            "is_online": u.is_online,
+            "is_online": presence.is_online(u.id),
         }
         for u in users
     ]
@@ -135,12 +226,50 @@ async def get_connections(
 
 @router.get("/pending")
 async def get_pending_requests(
+    response: Response,
+    if_none_match: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
+    """
+    Incoming connection requests. Carries an ETag; send it back as
+    If-None-Match to get a 304 when nothing has changed.
+
+    The ETag is derived from the pending rows themselves (how many, the
+    newest, and when a sender's profile last changed) with one indexed
+    query, so every worker agrees on it and a 304 skips building the body.
+    """
+    etag = await _pending_etag(db, current_user_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return await _pending_requests(db, current_user_id)
+
+
+async def _pending_etag(db: AsyncSession, current_user_id: str) -> str:
+    result = await db.execute(
+        select(
+            func.count(),
+            func.max(UserConnection.created_at),
+            func.max(UserConnection.id),
+            func.max(User.updated_at),
+        )
+        .select_from(UserConnection)
+        .join(User, User.id == UserConnection.user_id)
+        .where(
+            UserConnection.connected_user_id == current_user_id,
+            UserConnection.status == "pending",
+        )
+    )
+    version = "|".join(str(value) for value in result.one())
+    return '"' + hashlib.sha256(version.encode()).hexdigest()[:32] + '"'
+
+
+async def _pending_requests(db: AsyncSession, current_user_id: str) -> list[dict]:
     result = await db.execute(
         select(UserConnection).where(
-            UserConnection.connected_user_id == current_user.id,
+            UserConnection.connected_user_id == current_user_id,
             UserConnection.status == "pending",
         )
     )
@@ -172,10 +301,10 @@ async def get_pending_requests(
 async def send_direct_message(
     data: DirectMessageCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
     msg = DirectMessage(
-        sender_id=current_user.id,
+        sender_id=current_user_id,
         receiver_id=data.receiver_id,
         content=data.content,
         message_type=data.message_type,
@@ -183,35 +312,142 @@ async def send_direct_message(
     db.add(msg)
     await db.commit()
     await db.refresh(msg)
-    return {
+    payload = {
         "id": msg.id,
         "sender_id": msg.sender_id,
         "receiver_id": msg.receiver_id,
         "content": msg.content,
         "message_type": msg.message_type,
+        "is_read": msg.is_read,
         "created_at": str(msg.created_at),
     }
+    # Push to the recipient, and to the sender's other open tabs
+    await hub.publish(msg.receiver_id, "direct_message", payload)
+    await hub.publish(msg.sender_id, "direct_message", payload)
+    return payload
 
 
-@router.get("/messages/{user_id}")
-async def get_direct_messages(
+@router.get("/inbox")
+async def get_inbox(
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """
+    Your conversations, most recent first: each partner with the last
+    message and how many of their messages you haven't read. One query:
+    messages you sent and received are read through their own indexes,
+    then a window function picks each conversation's latest message and
+    sums its unread count.
+    """
+    sent = select(
+        DirectMessage.receiver_id.label("partner_id"),
+        DirectMessage.id,
+        DirectMessage.sender_id,
+        DirectMessage.content,
+        DirectMessage.message_type,
+        DirectMessage.created_at,
+        literal(0).label("unread"),
+    ).where(DirectMessage.sender_id == current_user_id)
+    received = select(
+        DirectMessage.sender_id.label("partner_id"),
+        DirectMessage.id,
+        DirectMessage.sender_id,
+        DirectMessage.content,
+        DirectMessage.message_type,
+        DirectMessage.created_at,
+        case((DirectMessage.is_read.is_(False), 1), else_=0).label("unread"),
+    ).where(DirectMessage.receiver_id == current_user_id)
+    mine = union_all(sent, received).subquery()
+
+    ranked = select(
+        mine,
+        func.row_number()
+        .over(partition_by=mine.c.partner_id, order_by=(mine.c.created_at.desc(), mine.c.id.desc()))
+        .label("rn"),
+        func.sum(mine.c.unread).over(partition_by=mine.c.partner_id).label("unread_count"),
+    ).subquery()
+
+    result = await db.execute(
+        select(
+            ranked.c.partner_id,
+            ranked.c.id,
+            ranked.c.sender_id,
+            ranked.c.content,
+            ranked.c.message_type,
+            ranked.c.created_at,
+            ranked.c.unread_count,
+            User.username,
+            User.display_name,
+            User.avatar_url,
+            User.current_mood,
+        )
+        .join(User, User.id == ranked.c.partner_id)
+        .where(ranked.c.rn == 1)
+        .order_by(ranked.c.created_at.desc(), ranked.c.id.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "user": {
+                "id": row.partner_id,
+                "username": row.username,
+                "display_name": row.display_name,
+                "avatar_url": row.avatar_url,
+                "current_mood": row.current_mood,
+                "is_online": presence.is_online(row.partner_id),
+            },
+            "last_message": {
+                "id": row.id,
+                "sender_id": row.sender_id,
+                "content": row.content,
+                "message_type": row.message_type,
+                "created_at": str(row.created_at),
+            },
+            "unread_count": row.unread_count,
+        }
+        for row in result.all()
+    ]
+
+
+@router.put("/messages/{user_id}/read")
+async def mark_messages_read(
     user_id: str,
-    limit: int = 50,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
+    """Mark every message `user_id` has sent you as read, in one UPDATE."""
     result = await db.execute(
-        select(DirectMessage)
+        update(DirectMessage)
         .where(
-            or_(
-                and_(DirectMessage.sender_id == current_user.id, DirectMessage.receiver_id == user_id),
-                and_(DirectMessage.sender_id == user_id, DirectMessage.receiver_id == current_user.id),
-            )
+            DirectMessage.receiver_id == current_user_id,
+            DirectMessage.sender_id == user_id,
+            DirectMessage.is_read.is_(False),
+        )
+        .values(is_read=True)
+    )
+    await db.commit()
+    return {"marked_read": result.rowcount}
+
+
+@router.get("/messages/{user_id}")
+async def get_direct_messages(
+    user_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    after: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """Conversation with another user, oldest first, paged like /api/chat/history."""
+    query = select(DirectMessage).where(
+        or_(
+            and_(DirectMessage.sender_id == current_user_id, DirectMessage.receiver_id == user_id),
+            and_(DirectMessage.sender_id == user_id, DirectMessage.receiver_id == current_user_id),
         )
-        .order_by(desc(DirectMessage.created_at))
-        .limit(limit)
     )
-    messages = result.scalars().all()
+    messages = await fetch_page(db, query, DirectMessage, response, limit, before, after)
     return [
         {
             "id": m.id,
@@ -222,7 +458,7 @@ async def get_direct_messages(
             "is_read": m.is_read,
             "created_at": str(m.created_at),
         }
-        for m in reversed(messages)
+        for m in messages
     ]
 
 
@@ -230,14 +466,14 @@ async def get_direct_messages(
 async def clear_chat_history(
     user_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
     await db.execute(
         select(DirectMessage)
         .where(
             or_(
-                and_(DirectMessage.sender_id == current_user.id, DirectMessage.receiver_id == user_id),
-                and_(DirectMessage.sender_id == user_id, DirectMessage.receiver_id == current_user.id),
+                and_(DirectMessage.sender_id == current_user_id, DirectMessage.receiver_id == user_id),
+                and_(DirectMessage.sender_id == user_id, DirectMessage.receiver_id == current_user_id),
             )
         )
     )
@@ -247,10 +483,90 @@ async def clear_chat_history(
     await db.execute(
         delete(DirectMessage).where(
             or_(
-                and_(DirectMessage.sender_id == current_user.id, DirectMessage.receiver_id == user_id),
-                and_(DirectMessage.sender_id == user_id, DirectMessage.receiver_id == current_user.id),
+                and_(DirectMessage.sender_id == current_user_id, DirectMessage.receiver_id == user_id),
+                and_(DirectMessage.sender_id == user_id, DirectMessage.receiver_id == current_user_id),
             )
         )
     )
     await db.commit()
     return {"message": "Chat history cleared"}
+
+
+# --- Real-time ---
+@router.get("/events")
+async def event_stream(token: str | None = None):
+    """
+    Server-sent events for the signed-in user, the same events as /ws:
+    connection_request, connection_accepted and direct_message. Authenticate
+    with ?token=<access token> (EventSource can't set headers). A comment
+    line is sent every REALTIME_SSE_KEEPALIVE_SECONDS to keep proxies from
+    closing an idle stream.
+    """
+    user_id = user_id_for_token(token)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    async def stream():
+        # Subscribed only once the response is actually being sent, so the finally always runs
+        subscription = hub.subscribe(user_id)
+        presence.connect(user_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), REALTIME_SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break  # Server shutting down; EventSource reconnects after `retry`
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+            presence.disconnect(user_id)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def realtime_socket(websocket: WebSocket, token: str | None = None):
+    """
+    Push channel for the signed-in user. Authenticate with ?token=<access token>
+    (browsers can't set headers on WebSockets). Each frame is a JSON event
+    {"type": ..., "data": ...}, e.g. "direct_message" with the message body
+    POST /messages returns. Anything the client sends is ignored.
+    """
+    user_id = user_id_for_token(token)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async def push() -> None:
+        try:
+            while True:
+                event = await subscription.get()
+                if event is None:
+                    # Server shutting down; the client's close reply ends the receive loop
+                    await websocket.close(code=status.WS_1012_SERVICE_RESTART)
+                    return
+                await websocket.send_json(event)
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # Closed while sending; the receive loop sees the disconnect
+
+    subscription = hub.subscribe(user_id)
+    presence.connect(user_id)
+    pusher = asyncio.create_task(push())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        pusher.cancel()
+        hub.unsubscribe(subscription)
+        presence.disconnect(user_id)
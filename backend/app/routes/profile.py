@@ -1,16 +1,35 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, func
+from sqlalchemy import select, desc, delete, insert
 from app.database import get_db
-from app.models.models import User, EmotionLog
+from app.models.models import User, EmotionLog, UserInterest, generate_uuid
 from app.models.schemas import ProfileUpdate, EmotionLogCreate
-from app.utils.auth import get_current_user
+from app.utils.auth import get_current_user, get_current_user_id, invalidate_user
+from app.services.write_behind import write_behind
+from app.services.emotion_counts import get_emotion_counts, increment_emotion_counts
+from app.services.mood_timeline import BUCKET_SIZES, mood_timeline
+from app.services.presence import presence
+from app.services.matching import match_index, normalize_interest
+from app.services.emotion_vectors import emotion_vectors
+from app.config import TIMELINE_MAX_BUCKETS
 
 router = APIRouter(prefix="/api/profile", tags=["Profile"])
 
 
+async def _interests_of(db: AsyncSession, user_id: str) -> list[str]:
+    result = await db.execute(
+        select(UserInterest.interest).where(UserInterest.user_id == user_id).order_by(UserInterest.interest)
+    )
+    return list(result.scalars().all())
+
+
 @router.get("/me")
-async def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     return {
         "id": current_user.id,
         "username": current_user.username,
@@ -21,6 +40,7 @@ async def get_profile(current_user: User = Depends(get_current_user)):
         "voice_preference": current_user.voice_preference,
         "theme_preference": current_user.theme_preference,
         "current_mood": current_user.current_mood,
+        "interests": await _interests_of(db, current_user.id),
         "created_at": str(current_user.created_at),
     }
 
@@ -32,9 +52,26 @@ async def update_profile(
     current_user: User = Depends(get_current_user),
 ):
     update_data = data.model_dump(exclude_unset=True)
+    interests = update_data.pop("interests", None)
     for key, value in update_data.items():
         setattr(current_user, key, value)
+    if interests is not None:
+        interests = sorted({normalize_interest(i)[:100] for i in interests if i.strip()})
+        await db.execute(delete(UserInterest).where(UserInterest.user_id == current_user.id))
+        if interests:
+            await db.execute(
+                insert(UserInterest),
+                [{"id": generate_uuid(), "user_id": current_user.id, "interest": i} for i in interests],
+            )
     await db.commit()
+    if "current_mood" in update_data:
+        # A chat mood still queued for write-behind is older than this one
+        write_behind.discard_mood(current_user.id)
+    invalidate_user(current_user.id)
+    if "current_mood" in update_data:
+        match_index.set_mood(current_user.id, current_user.current_mood)
+    if interests is not None:
+        match_index.set_interests(current_user.id, interests)
     await db.refresh(current_user)
     return {
         "id": current_user.id,
@@ -46,6 +83,7 @@ async def update_profile(
         "voice_preference": current_user.voice_preference,
         "theme_preference": current_user.theme_preference,
         "current_mood": current_user.current_mood,
+        "interests": interests if interests is not None else await _interests_of(db, current_user.id),
     }
 
 
@@ -53,12 +91,12 @@ async def update_profile(
 async def get_emotion_logs(
     limit: int = 30,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
     """Return recent emotion logs for mood tracking graph."""
     result = await db.execute(
         select(EmotionLog)
-        .where(EmotionLog.user_id == current_user.id)
+        .where(EmotionLog.user_id == current_user_id)
         .order_by(desc(EmotionLog.created_at))
         .limit(limit)
     )
@@ -89,31 +127,50 @@ async def log_emotion(
     )
     db.add(log)
     current_user.current_mood = data.emotion
+    await increment_emotion_counts(db, [(current_user.id, data.emotion)])
     await db.commit()
+    # A chat mood still queued for write-behind is older than this one
+    write_behind.discard_mood(current_user.id)
+    invalidate_user(current_user.id)
+    match_index.set_mood(current_user.id, data.emotion)
     await db.refresh(log)
+    emotion_vectors.record(log.id, current_user.id, log.emotion, log.intensity, log.created_at)
     return {"id": log.id, "emotion": log.emotion, "intensity": log.intensity, "created_at": str(log.created_at)}
 
 
 @router.get("/emotions/summary")
 async def emotion_summary(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
     """Return emotion frequency counts for chart display."""
-    result = await db.execute(
-        select(EmotionLog.emotion, func.count(EmotionLog.id).label("count"))
-        .where(EmotionLog.user_id == current_user.id)
-        .group_by(EmotionLog.emotion)
-    )
-    rows = result.all()
-    return {row[0]: row[1] for row in rows}
+    return await get_emotion_counts(db, current_user_id)
+
+
+@router.get("/emotions/timeline")
+async def emotion_timeline(
+    bucket: Literal["hour", "day", "week"] = "day",
+    days: int = Query(30, ge=1, le=730),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """
+    Mood over the last `days` days, downsampled into hour/day/week buckets.
+    Each bucket has per-emotion counts, mean intensity and mean sentiment;
+    buckets without logs are left out.
+    """
+    span = timedelta(days=days)
+    if span / BUCKET_SIZES[bucket] > TIMELINE_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Too many {bucket} buckets; use a shorter range or a larger bucket")
+    buckets = await mood_timeline(db, current_user_id, bucket, datetime.utcnow() - span)
+    return {"bucket": bucket, "days": days, "buckets": buckets}
 
 
 @router.get("/{user_id}")
 async def get_public_profile(
     user_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
@@ -127,7 +184,7 @@ async def get_public_profile(
         "avatar_url": user.avatar_url,
         "bio": user.bio,
         "current_mood": user.current_mood,
-        "is_online": user.is_online,
+        "is_online": presence.is_online(user.id),
         "created_at": str(user.created_at),
     }
 
@@ -136,13 +193,7 @@ async def get_public_profile(
 async def public_emotion_summary(
     user_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
 ):
     """Return emotion frequency counts for another user."""
-    result = await db.execute(
-        select(EmotionLog.emotion, func.count(EmotionLog.id).label("count"))
-        .where(EmotionLog.user_id == user_id)
-        .group_by(EmotionLog.emotion)
-    )
-    rows = result.all()
-    return {row[0]: row[1] for row in rows}
+    return await get_emotion_counts(db, user_id)
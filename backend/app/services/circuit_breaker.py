@@ -0,0 +1,142 @@
+"""
+Rolling-window circuit breaker for calls to an unreliable dependency.
+
+closed    -> open       when, over the last window_seconds and at least
+                         min_calls calls, the share of failed or slow calls
+                         reaches failure_rate_threshold
+open      -> half_open  after open_seconds; up to half_open_max_calls probe
+                         calls are let through
+half_open -> closed     when a probe succeeds (the window starts fresh)
+half_open -> open       when a probe fails
+"""
+
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BreakerCall:
+    """One admitted call; finish() records its outcome exactly once."""
+
+    def __init__(self, breaker: "CircuitBreaker", probe: bool):
+        self._breaker = breaker
+        self._probe = probe
+        self._started = time.monotonic()
+        self._finished = False
+
+    def finish(self, ok: bool) -> None:
+        latency = time.monotonic() - self._started
+        with self._breaker._lock:
+            if self._finished:
+                return
+            self._finished = True
+            self._breaker._record(ok, latency, self._probe)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 8.0,
+        window_seconds: float = 60.0,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._window: deque[tuple[float, bool, float]] = deque()  # (finished_at, ok, latency)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.trips = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    def try_call(self) -> BreakerCall | None:
+        """Admit a call, or return None if the breaker is rejecting calls."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+                self._probes_in_flight = 0
+            if self._state == CLOSED:
+                return BreakerCall(self, probe=False)
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return BreakerCall(self, probe=True)
+            self.rejected += 1
+            return None
+
+    def _record(self, ok: bool, latency: float, probe: bool) -> None:
+        # Caller holds self._lock
+        now = time.monotonic()
+        ok = ok and latency <= self.slow_call_seconds
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self._window.append((now, ok, latency))
+        self._prune(now)
+
+        if probe and self._state == HALF_OPEN:
+            self._probes_in_flight -= 1
+            if ok:
+                self._state = CLOSED
+                self._window.clear()
+            else:
+                self._trip(now)
+        elif self._state == CLOSED and len(self._window) >= self.min_calls:
+            if self._failure_rate() >= self.failure_rate_threshold:
+                self._trip(now)
+
+    def _trip(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self.trips += 1
+
+    def _prune(self, now: float) -> None:
+        while self._window and now - self._window[0][0] > self.window_seconds:
+            self._window.popleft()
+
+    def _failure_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return sum(1 for _, ok, _ in self._window if not ok) / len(self._window)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            self._prune(time.monotonic())
+            latencies = sorted(latency for _, _, latency in self._window)
+            return {
+                "name": self.name,
+                "state": state,
+                "failure_rate": round(self._failure_rate(), 4),
+                "window_calls": len(latencies),
+                "latency_avg_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                "latency_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1) if latencies else None,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "successes": self.successes,
+                "failures": self.failures,
+            }
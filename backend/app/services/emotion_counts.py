@@ -0,0 +1,83 @@
+"""
+Per-user emotion counts behind the emotion summary endpoints.
+
+Every EmotionLog write also bumps UserEmotionCount in the same transaction
+with an upsert, so a summary is a read of one row per distinct emotion
+instead of a GROUP BY over the user's whole log history.
+scripts/rebuild_emotion_counts.py recomputes the table from emotion_logs
+and can check the two agree.
+"""
+
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+from app.models.models import EmotionLog, UserEmotionCount
+
+_UPSERT_DIALECTS = {"sqlite": sqlite, "postgresql": postgresql}
+
+
+async def increment_emotion_counts(db: AsyncSession, pairs: Iterable[tuple[str, str]]) -> None:
+    """
+    Add one to the count of each (user_id, emotion) pair, as part of the
+    caller's transaction. Repeated pairs are summed into one row first.
+    """
+    counts = Counter(pairs)
+    if not counts:
+        return
+    rows = [{"user_id": user_id, "emotion": emotion, "count": n} for (user_id, emotion), n in counts.items()]
+
+    dialect = _UPSERT_DIALECTS.get(engine.dialect.name)
+    if dialect is None:
+        raise RuntimeError(f"No emotion count upsert for the {engine.dialect.name} dialect")
+    stmt = dialect.insert(UserEmotionCount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserEmotionCount.user_id, UserEmotionCount.emotion],
+        set_={"count": UserEmotionCount.count + stmt.excluded.count},
+    )
+    await db.execute(stmt, rows)
+
+
+async def get_emotion_counts(db: AsyncSession, user_id: str) -> dict[str, int]:
+    result = await db.execute(
+        select(UserEmotionCount.emotion, UserEmotionCount.count)
+        .where(UserEmotionCount.user_id == user_id, UserEmotionCount.count > 0)
+    )
+    return {emotion: count for emotion, count in result.all()}
+
+
+def _counts_from_logs():
+    return (
+        select(EmotionLog.user_id, EmotionLog.emotion, func.count(EmotionLog.id).label("count"))
+        .group_by(EmotionLog.user_id, EmotionLog.emotion)
+    )
+
+
+async def rebuild_emotion_counts(db: AsyncSession) -> int:
+    """Replace every count with a fresh GROUP BY over emotion_logs. Returns rows written."""
+    await db.execute(delete(UserEmotionCount))
+    result = await db.execute(
+        insert(UserEmotionCount).from_select(["user_id", "emotion", "count"], _counts_from_logs())
+    )
+    return result.rowcount
+
+
+async def find_count_mismatches(db: AsyncSession) -> list[tuple[str, str, int, int]]:
+    """(user_id, emotion, stored, actual) for every count that disagrees with emotion_logs."""
+    actual = {(u, e): n for u, e, n in (await db.execute(_counts_from_logs())).all()}
+    stored = {
+        (u, e): n
+        for u, e, n in (await db.execute(
+            select(UserEmotionCount.user_id, UserEmotionCount.emotion, UserEmotionCount.count)
+        )).all()
+    }
+    mismatches = []
+    for user_id, emotion in stored.keys() | actual.keys():
+        have, want = stored.get((user_id, emotion), 0), actual.get((user_id, emotion), 0)
+        if have != want:
+            mismatches.append((user_id, emotion, have, want))
+    return sorted(mismatches)
@@ -6,14 +6,35 @@ emoji analysis, negation handling, and human-like empathetic responses
 powered by Google Gemini (with rule-based fallback).
 """
 
+import asyncio
+import hashlib
 import random
 import re
 import os
 import json
 import logging
-from dataclasses import dataclass, field
-import google.generativeai as genai
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from dotenv import load_dotenv
+from app.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_TIMEOUT_SECONDS,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_BYPASS_WITH_HISTORY,
+    LLM_BACKEND,
+    FAKE_LLM_FIRST_CHUNK_DELAY_MS,
+    FAKE_LLM_CHUNK_DELAY_MS,
+    LLM_LATENCY_BUDGET_SECONDS,
+    LLM_BREAKER_FAILURE_RATE,
+    LLM_BREAKER_MIN_CALLS,
+    LLM_BREAKER_WINDOW_SECONDS,
+    LLM_BREAKER_OPEN_SECONDS,
+)
+from app.services.circuit_breaker import CLOSED, CircuitBreaker
+from app.services.prompting import AssembledPrompt, build_prompt, record_prompt, prompt_stats
+from app.utils.cache import TTLCache
 
 load_dotenv()
 
@@ -21,54 +42,21 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configure Gemini
+# Gemini is configured lazily (see get_model) so importing this module stays
+# cheap: no SDK import or model construction until a reply is needed.
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    
-    # List of models to try in order of preference
-    MODELS_TO_TRY = [
-        "gemini-2.5-flash",
-        "gemini-1.5-flash", 
-        "gemini-1.5-flash-001",
-        "gemini-1.5-flash-8b",
-        "gemini-1.5-pro",
-        "gemini-1.0-pro",
-        "gemini-pro",
-        "gemini-flash-latest"
-    ]
-    
-    model = None
-    for model_name in MODELS_TO_TRY:
-        try:
-            temp_model = genai.GenerativeModel(model_name)
-            # Just test init for now
-            pass
-        except:
-            continue
 
-    # We will try to use a specific known working model. 
-    # Since 1.5-flash 404'd, let's try 1.5-flash explicitly again.
-    # The previous 404 might have been ephemeral.
-    
-    try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-    except:
-        model = None
-        
-    if not model:
-        try:
-            model = genai.GenerativeModel("gemini-pro", system_instruction=SYSTEM_PROMPT)
-        except:
-            model = None
-            
-    if model:
-        logger.info(f"Gemini initialized with system instruction")
-    else:
-        logger.warning("Failed to initialize Gemini model.")
-else:
-    logger.warning("GEMINI_API_KEY not found. Falling back to rule-based system.")
-    model = None
+# List of models to try in order of preference
+MODELS_TO_TRY = [
+    "gemini-2.5-flash",
+    "gemini-1.5-flash", 
+    "gemini-1.5-flash-001",
+    "gemini-1.5-flash-8b",
+    "gemini-1.5-pro",
+    "gemini-1.0-pro",
+    "gemini-pro",
+    "gemini-flash-latest"
+]
 
 # ============================================================================
 # CRISIS DETECTION — highest priority, checked first (ALWAYS RULE-BASED)
@@ -407,16 +395,108 @@ class EmotionResult:
     context_tags: list = field(default_factory=list)
 
 
+# ============================================================================
+# COMPILED MATCHING ENGINE (RULE-BASED)
+# ============================================================================
+# Everything the rule-based detector needs is compiled once at import time:
+#   - CRISIS_PATTERNS and EMOTION_PHRASES share one alternation, used to find
+#     each position where some pattern starts; a second compiled regex of
+#     optional lookaheads (one named group per pattern) then reports every
+#     pattern matching at that position in a single call.
+#   - KEYWORD_EMOTIONS becomes a token -> emotions table, checked against one
+#     \w+ tokenization of the message.
+#   - The NEGATION_WORDS x positive-word grid is evaluated over the same token
+#     list instead of one regex per pair.
+# Results are identical to running each pattern through re.search.
+
+POSITIVE_WORDS = ["good", "fine", "well", "okay", "ok", "great", "happy", "right", "better"]
+
+SENTIMENT_MAP = {
+    "happy": 0.8, "grateful": 0.9, "sad": -0.7, "heartbreak": -0.85,
+    "grief": -0.9, "depressed": -0.85, "anxious": -0.5, "angry": -0.6,
+    "confused": -0.2, "tired": -0.3, "neutral": 0.0, "crisis": -1.0,
+}
+
+# (phrase group or None for crisis, pattern) in the order the detector checks them
+_PATTERNS: list[tuple[str | None, str]] = (
+    [(None, p) for p in CRISIS_PATTERNS]
+    + [(group, p) for group, patterns in EMOTION_PHRASES.items() for p in patterns]
+)
+_CRISIS_RE = re.compile("|".join(f"(?:{p})" for p in CRISIS_PATTERNS), re.IGNORECASE)
+_PATTERN_SCAN_RE = re.compile("|".join(f"(?:{p})" for _, p in _PATTERNS), re.IGNORECASE)
+_PATTERN_AT_RE = re.compile(
+    "".join(f"(?:(?=(?P<p{i}>{p})))?" for i, (_, p) in enumerate(_PATTERNS)), re.IGNORECASE
+)
+_PATTERN_GROUP_INDEX = [_PATTERN_AT_RE.groupindex[f"p{i}"] for i in range(len(_PATTERNS))]
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_KEYWORD_INDEX: dict[str, list[str]] = {}
+for _emotion, _keywords in KEYWORD_EMOTIONS.items():
+    for _kw in _keywords:
+        _KEYWORD_INDEX.setdefault(_kw, []).append(_emotion)
+
+# Negation words as token sequences: "don't" -> ("don", "t") joined by an apostrophe
+_NEGATION_TOKENS = frozenset(tuple(neg.split("'")) for neg in NEGATION_WORDS)
+_POSITIVE_TOKENS = frozenset(POSITIVE_WORDS)
+
+
+def _scan_patterns(text: str) -> list[int]:
+    """Return the indices into _PATTERNS of every pattern found in the text."""
+    hits: set[int] = set()
+    m = _PATTERN_SCAN_RE.search(text)
+    while m:
+        start = m.start()
+        spans = _PATTERN_AT_RE.match(text, start).regs
+        for i, group in enumerate(_PATTERN_GROUP_INDEX):
+            if spans[group][0] != -1:
+                hits.add(i)
+        # Resume right after this start (not after the match) so patterns
+        # beginning inside an earlier match are still found.
+        m = _PATTERN_SCAN_RE.search(text, start + 1)
+    return sorted(hits)
+
+
+def _tokenize(text_lower: str) -> list[re.Match]:
+    return list(_TOKEN_RE.finditer(text_lower))
+
+
+def _negated_positive(text_lower: str, tokens: list[re.Match]) -> bool:
+    """
+    Token-level equivalent of rf'\\b{neg}\\b\\s+\\w*\\s*\\b{pos}\\b' for every
+    negation/positive pair: a negation, whitespace, at most one other word
+    (also followed by whitespace), then a positive word.
+    """
+    def gap_is_space(i: int) -> bool:
+        # Text between token i-1 and token i is non-empty whitespace
+        return text_lower[tokens[i - 1].end():tokens[i].start()].isspace()
+
+    def ends_negation(i: int) -> bool:
+        if (tokens[i].group(),) in _NEGATION_TOKENS:
+            return True
+        return (
+            i > 0
+            and text_lower[tokens[i - 1].end():tokens[i].start()] == "'"
+            and (tokens[i - 1].group(), tokens[i].group()) in _NEGATION_TOKENS
+        )
+
+    for k in range(1, len(tokens)):
+        if tokens[k].group() not in _POSITIVE_TOKENS or not gap_is_space(k):
+            continue
+        if ends_negation(k - 1):
+            return True
+        if k > 1 and gap_is_space(k - 1) and ends_negation(k - 2):
+            return True
+    return False
+
+
 # ============================================================================
 # HELPER FUNCTIONS (RULE-BASED)
 # ============================================================================
 
 def _check_crisis(text: str) -> bool:
     """Check if the message contains crisis/self-harm indicators."""
-    for pattern in CRISIS_PATTERNS:
-        if re.search(pattern, text, re.IGNORECASE):
-            return True
-    return False
+    return _CRISIS_RE.search(text) is not None
 
 def _detect_emoji_emotion(text: str) -> str | None:
     emoji_scores: dict[str, int] = {}
@@ -429,15 +509,18 @@ def _detect_emoji_emotion(text: str) -> str | None:
         return max(emoji_scores, key=emoji_scores.get)
     return None
 
-def _detect_phrase_emotion(text: str) -> tuple[str | None, list[str]]:
+def _detect_phrase_emotion(text: str, hits: list[int] | None = None) -> tuple[str | None, list[str]]:
+    if hits is None:
+        hits = _scan_patterns(text)
     matches: dict[str, int] = {}
     tags: list[str] = []
-    for group, patterns in EMOTION_PHRASES.items():
-        for pattern in patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                emotion = PHRASE_TO_EMOTION[group]
-                matches[emotion] = matches.get(emotion, 0) + 1
-                tags.append(group)
+    for i in hits:
+        group = _PATTERNS[i][0]
+        if group is None:
+            continue
+        emotion = PHRASE_TO_EMOTION[group]
+        matches[emotion] = matches.get(emotion, 0) + 1
+        tags.append(group)
     if matches:
         dominant = max(matches, key=matches.get)
         return dominant, list(set(tags))
@@ -445,23 +528,24 @@ def _detect_phrase_emotion(text: str) -> tuple[str | None, list[str]]:
 
 def _has_negation_before_positive(text: str) -> bool:
     text_lower = text.lower()
-    positive_words = ["good", "fine", "well", "okay", "ok", "great", "happy", "right", "better"]
-    for neg in NEGATION_WORDS:
-        for pos in positive_words:
-            if re.search(rf'\b{neg}\b\s+\w*\s*\b{pos}\b', text_lower):
-                return True
-    return False
+    return _negated_positive(text_lower, _tokenize(text_lower))
 
-def _detect_keyword_emotion(text: str) -> str | None:
-    text_lower = text.lower()
-    scores: dict[str, int] = {}
-    for emotion, keywords in KEYWORD_EMOTIONS.items():
-        for kw in keywords:
-            if re.search(rf'\b{re.escape(kw)}\b', text_lower):
-                scores[emotion] = scores.get(emotion, 0) + 1
-    if not scores:
+def _detect_keyword_emotion(
+    text: str, tokens: list[re.Match] | None = None, negated: bool | None = None
+) -> str | None:
+    if tokens is None:
+        tokens = _tokenize(text.lower())
+    counts: dict[str, int] = {}
+    for word in {t.group() for t in tokens}:
+        for emotion in _KEYWORD_INDEX.get(word, ()):
+            counts[emotion] = counts.get(emotion, 0) + 1
+    if not counts:
         return None
-    if _has_negation_before_positive(text):
+    # Rebuild in KEYWORD_EMOTIONS order so max() breaks ties the same way
+    scores = {emotion: counts[emotion] for emotion in KEYWORD_EMOTIONS if emotion in counts}
+    if negated is None:
+        negated = _has_negation_before_positive(text)
+    if negated:
         if "happy" in scores:
             del scores["happy"]
         scores["sad"] = scores.get("sad", 0) + 2
@@ -470,28 +554,35 @@ def _detect_keyword_emotion(text: str) -> str | None:
     return max(scores, key=scores.get)
 
 def detect_emotion_rule_based(text: str) -> EmotionResult:
+    hits = _scan_patterns(text)
+
     # Layer 1: Crisis
-    if _check_crisis(text):
+    if any(_PATTERNS[i][0] is None for i in hits):
         return EmotionResult(
             emotion="crisis", confidence=1.0, sentiment_score=-1.0, is_crisis=True,
             context_tags=["crisis", "safety"]
         )
 
+    # Shared by the keyword layer and the combine step
+    text_lower = text.lower()
+    tokens = _tokenize(text_lower)
+    negated = _negated_positive(text_lower, tokens)
+
     # Layer 2: Phrases
-    phrase_emotion, tags = _detect_phrase_emotion(text)
+    phrase_emotion, tags = _detect_phrase_emotion(text, hits)
 
     # Layer 3: Emoji
     emoji_emotion = _detect_emoji_emotion(text)
 
     # Layer 4: Keywords
-    keyword_emotion = _detect_keyword_emotion(text)
+    keyword_emotion = _detect_keyword_emotion(text, tokens, negated)
 
     # Combine
     if phrase_emotion:
         emotion = phrase_emotion
         confidence = 0.9
     elif emoji_emotion and keyword_emotion:
-        if _has_negation_before_positive(text):
+        if negated:
             emotion = emoji_emotion if emoji_emotion != "happy" else keyword_emotion
         else:
             emotion = keyword_emotion
@@ -503,26 +594,37 @@ def detect_emotion_rule_based(text: str) -> EmotionResult:
         emotion = keyword_emotion
         confidence = 0.7
     else:
-        if _has_negation_before_positive(text):
+        if negated:
             emotion = "sad"
             confidence = 0.6
         else:
             emotion = "neutral"
             confidence = 0.3
 
-    sentiment_map = {
-        "happy": 0.8, "grateful": 0.9, "sad": -0.7, "heartbreak": -0.85,
-        "grief": -0.9, "depressed": -0.85, "anxious": -0.5, "angry": -0.6,
-        "confused": -0.2, "tired": -0.3, "neutral": 0.0, "crisis": -1.0,
-    }
-
     return EmotionResult(
         emotion=emotion,
         confidence=confidence,
-        sentiment_score=sentiment_map.get(emotion, -0.3),
+        sentiment_score=SENTIMENT_MAP.get(emotion, -0.3),
         context_tags=tags,
     )
 
+def detect_emotion_batch(texts: list[str]) -> list[EmotionResult]:
+    """
+    Run detect_emotion_rule_based over many messages.
+    Repeated texts (short openers are very common) are analysed once per
+    batch; every position still gets its own EmotionResult instance.
+    """
+    seen: dict[str, EmotionResult] = {}
+    results: list[EmotionResult] = []
+    for text in texts:
+        result = seen.get(text)
+        if result is None:
+            result = seen[text] = detect_emotion_rule_based(text)
+            results.append(result)
+        else:
+            results.append(replace(result, context_tags=list(result.context_tags)))
+    return results
+
 def _build_crisis_response(text: str) -> dict:
     # ... (Same as before)
     responses = [
@@ -577,11 +679,147 @@ IMPORTANT RULES:
 5. **No Hallucinations**: You can be playful but don't invent false facts.
 """
 
+# Streamed replies put the user-visible text first and the metadata after it
+STREAM_META_MARKER = "###META###"
+
+STREAM_SYSTEM_PROMPT = SYSTEM_PROMPT + f"""
+6. **Streaming Format**: This overrides rule 4. Write your reply to the user as
+plain text (no JSON, no code fences). Then, on a new line, write
+{STREAM_META_MARKER} immediately followed by one line of JSON:
+{{"emotion": "...", "confidence": 0.0, "sentiment_score": 0.0, "coping_tip": "..."}}
+"""
+
+SUMMARY_SYSTEM_PROMPT = """
+You keep running notes on a chat between a user and their AI friend.
+Given the previous notes and some newer messages, write updated notes in
+plain text (no JSON, no lists of quotes): who the user is, what they care
+about, what is going on in their life, how they have been feeling, and any
+game or topic in progress. Keep it under 150 words, newest developments last.
+"""
+
+# ============================================================================
+# MODEL SETUP (lazy)
+# ============================================================================
+
+# The system prompt is set once per model as a system instruction instead of
+# being pasted into every user turn. Each kind of call gets its own model
+# object (same backend): JSON replies, streamed text-then-metadata replies,
+# and background conversation summaries.
+_MODEL_INSTRUCTIONS = {
+    "chat": SYSTEM_PROMPT,
+    "stream": STREAM_SYSTEM_PROMPT,
+    "summary": SUMMARY_SYSTEM_PROMPT,
+}
+
+_models: dict | None = None
+_models_initialized = False
+_models_lock = threading.Lock()
+
+
+def _build_models() -> dict | None:
+    if LLM_BACKEND == "fake":
+        from app.services.fake_model import FakeGenerativeModel
+
+        logger.info("Using local fake model (LLM_BACKEND=fake).")
+        return {
+            kind: FakeGenerativeModel(
+                first_chunk_delay=FAKE_LLM_FIRST_CHUNK_DELAY_MS / 1000,
+                chunk_delay=FAKE_LLM_CHUNK_DELAY_MS / 1000,
+                system_instruction=instruction,
+                plain_text=kind == "summary",
+            )
+            for kind, instruction in _MODEL_INSTRUCTIONS.items()
+        }
+
+    if not GEMINI_API_KEY:
+        logger.warning("GEMINI_API_KEY not found. Falling back to rule-based system.")
+        return None
+
+    # Heavy SDK import, deferred until a model is actually needed
+    import google.generativeai as genai
+
+    genai.configure(api_key=GEMINI_API_KEY)
+    for model_name in MODELS_TO_TRY:
+        try:
+            models = {
+                kind: genai.GenerativeModel(model_name, system_instruction=instruction)
+                for kind, instruction in _MODEL_INSTRUCTIONS.items()
+            }
+        except Exception:
+            continue
+        logger.info(f"Gemini initialized with {model_name}")
+        return models
+
+    logger.warning("Failed to initialize Gemini model.")
+    return None
+
+
+def get_model(kind: str = "chat"):
+    """Return the configured model (None if unavailable), building it on first use."""
+    global _models, _models_initialized
+    if not _models_initialized:
+        with _models_lock:
+            if not _models_initialized:
+                _models = _build_models()
+                _models_initialized = True
+    return _models[kind] if _models else None
+
+
+async def _get_model_async():
+    # First use may import the SDK; keep that off the event loop too
+    if _models_initialized:
+        return get_model()
+    return await asyncio.to_thread(get_model)
+
+
+async def warm_up_model() -> None:
+    """Build the model off the event loop; started from the app lifespan."""
+    try:
+        await asyncio.to_thread(get_model)
+    except Exception as e:
+        logger.error(f"Model warm-up failed: {e}")
+
+
+VALID_EMOTIONS = ["happy", "sad", "anxious", "angry", "confused", "tired", "grateful", "neutral", "heartbreak", "grief", "depressed", "crisis"]
+
+
+def _strip_code_fence(content: str) -> str:
+    # Clean up JSON (sometimes models wrap in ```json ... ```)
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+    return content
+
+
+def _normalize_model_result(data: dict, response_text: str) -> dict:
+    # Normalize emotion keys
+    if data.get("emotion") not in VALID_EMOTIONS:
+        data["emotion"] = "neutral"
+        
+    return {
+        "emotion": data["emotion"],
+        "confidence": data.get("confidence", 0.5),
+        "sentiment_score": data.get("sentiment_score", 0.0),
+        "response": response_text,
+        "coping_tip": data.get("coping_tip", "Take a deep breath."),
+        "is_crisis": data.get("emotion") == "crisis"
+    }
+
+
+def _parse_model_reply(content: str) -> dict:
+    data = json.loads(_strip_code_fence(content))
+    return _normalize_model_result(data, data["response"])
+
+
 def generate_response_with_gemini(text: str, history: list[dict] = []) -> dict:
     """
     Generate response using Gemini Pro.
     Expects history to be a list of {"role": "user"|"model", "parts": ["message"]}.
+    The persona and JSON format come from the model's system instruction, so
+    only the user's message is sent.
     """
+    model = get_model()
     if not model:
         raise Exception("Gemini model not initialized")
 
@@ -591,43 +829,8 @@ def generate_response_with_gemini(text: str, history: list[dict] = []) -> dict:
             
         # Construct chat session
         chat = model.start_chat(history=history)
-        
-        # Add system instruction as part of the message context if needed, 
-        # but for simple usage we'll prepend it to the latest message or assume the model 'persona'.
-        # For better stability, we can wrap the user's prompt (zero-shot style for strict JSON):
-        
-        prompt = f"""
-        {SYSTEM_PROMPT}
-
-        User message: "{text}"
-        
-        Respond ONLY in the specified JSON format.
-        """
-        
-        response = chat.send_message(prompt)
-        content = response.text
-        
-        # Clean up JSON (sometimes models wrap in ```json ... ```)
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0].strip()
-            
-        data = json.loads(content)
-        
-        # Normalize emotion keys
-        valid_emotions = ["happy", "sad", "anxious", "angry", "confused", "tired", "grateful", "neutral", "heartbreak", "grief", "depressed", "crisis"]
-        if data.get("emotion") not in valid_emotions:
-            data["emotion"] = "neutral"
-            
-        return {
-            "emotion": data["emotion"],
-            "confidence": data.get("confidence", 0.5),
-            "sentiment_score": data.get("sentiment_score", 0.0),
-            "response": data["response"],
-            "coping_tip": data.get("coping_tip", "Take a deep breath."),
-            "is_crisis": data.get("emotion") == "crisis"
-        }
+        response = chat.send_message(text, request_options={"timeout": LLM_TIMEOUT_SECONDS})
+        return _parse_model_reply(response.text)
         
     except Exception as e:
         with open("error_log.txt", "w") as f:
@@ -639,32 +842,366 @@ def generate_response_with_gemini(text: str, history: list[dict] = []) -> dict:
 
 
 # ============================================================================
-# MAIN ENTRY POINT
+# RESPONSE CACHE (Gemini results for repeat phrasings)
 # ============================================================================
 
-def generate_response(text: str, history: list = []) -> dict:
+_response_cache = TTLCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+
+
+def _normalize_message(text: str) -> str:
+    return " ".join(text.lower().split()).strip(" .!?,~")
+
+
+def _response_cache_key(text: str, gemini_history: list[dict]) -> str | None:
     """
-    Main function to generate response.
-    Tries Gemini first, falls back to Rule-Based.
+    Cache key: normalized message plus a fingerprint of the history window.
+    Returns None when the lookup should be bypassed.
     """
-    # Always check crisis locally first for safety/speed
-    if _check_crisis(text):
-        return _build_crisis_response(text)
-        
-    # Try Gemini
-    if model:
-        # Convert app history format to Gemini history format if needed
-        # Assuming history passed in is list of objects with 'content' and 'is_ai_response'
-        gemini_history = []
-        for msg in history[-10:]: # Keep context window reasonable
-            role = "model" if msg.get("is_ai_response") else "user"
-            gemini_history.append({"role": role, "parts": [msg.get("content", "")]})
-            
-        gemini_result = generate_response_with_gemini(text, gemini_history)
-        if gemini_result:
-            return gemini_result
+    if gemini_history and RESPONSE_CACHE_BYPASS_WITH_HISTORY:
+        return None
+    window = json.dumps(gemini_history, ensure_ascii=False, sort_keys=True)
+    fingerprint = hashlib.sha1(window.encode("utf-8")).hexdigest()
+    return f"{_normalize_message(text)}|{fingerprint}"
 
-    # Fallback to Rule-Based
+
+def _get_cached_response(cache_key: str | None) -> dict | None:
+    if cache_key is None:
+        return None
+    cached = _response_cache.get(cache_key)
+    return dict(cached) if cached else None
+
+
+def _store_cached_response(cache_key: str | None, result: dict) -> None:
+    # Crisis replies are never cached; user messages that look like a crisis
+    # are already answered by _check_crisis before the cache is consulted.
+    if cache_key is None or result.get("is_crisis"):
+        return
+    _response_cache.set(cache_key, dict(result))
+
+
+def response_cache_stats() -> dict:
+    return _response_cache.stats()
+
+
+# ============================================================================
+# ASYNC EXECUTION (keeps blocking Gemini calls off the event loop)
+# ============================================================================
+
+# Dedicated pool for model calls so a slow Gemini round-trip never blocks the
+# event loop or starves the default executor used by the rest of the app.
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="gemini")
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+def _release_llm_slot(loop: asyncio.AbstractEventLoop) -> None:
+    try:
+        loop.call_soon_threadsafe(_llm_slots.release)
+    except RuntimeError:
+        # Event loop already closed (shutdown); nothing left to wake up.
+        pass
+
+
+# Trips when too many Gemini calls fail or exceed the latency budget; while
+# open, requests go straight to the rule-based path.
+_gemini_breaker = CircuitBreaker(
+    "gemini",
+    failure_rate_threshold=LLM_BREAKER_FAILURE_RATE,
+    slow_call_seconds=LLM_LATENCY_BUDGET_SECONDS,
+    window_seconds=LLM_BREAKER_WINDOW_SECONDS,
+    min_calls=LLM_BREAKER_MIN_CALLS,
+    open_seconds=LLM_BREAKER_OPEN_SECONDS,
+)
+
+# Time a request waits for the model before answering rule-based; the call
+# itself may keep running up to LLM_TIMEOUT_SECONDS (the SDK request timeout).
+_LLM_BUDGET_SECONDS = min(LLM_LATENCY_BUDGET_SECONDS, LLM_TIMEOUT_SECONDS)
+
+
+async def _run_gemini_bounded(prompt: AssembledPrompt) -> dict | None:
+    """
+    Run generate_response_with_gemini on the model pool.
+    Skipped while the circuit breaker is open. Waiting for a slot and the call
+    share one per-request latency budget; returns None when the budget runs
+    out so the caller can fall back.
+    """
+    call = _gemini_breaker.try_call()
+    if call is None:
+        return None
+    record_prompt(prompt)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + _LLM_BUDGET_SECONDS
+
+    try:
+        await asyncio.wait_for(_llm_slots.acquire(), _LLM_BUDGET_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Gemini concurrency limit reached, using fallback.")
+        call.finish(False)
+        return None
+    except BaseException:
+        # Cancelled while waiting (e.g. client disconnect): record the call,
+        # or an admitted half-open probe would hold the breaker half-open forever
+        call.finish(False)
+        raise
+
+    def on_done(f) -> None:
+        # The slot is released when the worker thread finishes (or the queued
+        # call is cancelled), so abandoned calls still count against the limit.
+        _release_llm_slot(loop)
+        call.finish(not f.cancelled() and f.exception() is None and f.result() is not None)
+
+    future = _llm_executor.submit(generate_response_with_gemini, prompt.message, prompt.history)
+    future.add_done_callback(on_done)
+
+    try:
+        # Cancelling the wrapper (budget spent or client disconnect) also
+        # cancels the call if it has not started running yet.
+        return await asyncio.wait_for(asyncio.wrap_future(future), max(0.0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        logger.warning(f"Gemini call exceeded the {_LLM_BUDGET_SECONDS}s latency budget, using fallback.")
+        call.finish(False)
+        return None
+
+
+def llm_stats() -> dict:
+    """Breaker, cache and concurrency counters for monitoring."""
+    return {
+        "backend": LLM_BACKEND,
+        "latency_budget_seconds": _LLM_BUDGET_SECONDS,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "breaker": _gemini_breaker.snapshot(),
+        "prompt": prompt_stats.snapshot(),
+        "response_cache": response_cache_stats(),
+    }
+
+
+# ============================================================================
+# STREAMING
+# ============================================================================
+
+class _StreamSplitter:
+    """
+    Splits a streamed reply into user-visible text and trailing metadata.
+    Text is released as soon as it arrives, holding back only trailing
+    whitespace and anything that could be the start of STREAM_META_MARKER.
+    If the model answers in JSON anyway, the reply is buffered and parsed
+    when the stream ends.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pending = ""
+        self._meta: str | None = None
+        self._json: str | None = None
+
+    def feed(self, chunk: str) -> str:
+        if self._json is not None:
+            self._json += chunk
+            return ""
+        if self._meta is not None:
+            self._meta += chunk
+            return ""
+
+        self._pending += chunk
+        if not self.text:
+            head = self._pending.lstrip()
+            if not head:
+                return ""
+            if head[0] in "{`":
+                self._json, self._pending = self._pending, ""
+                return ""
+
+        if STREAM_META_MARKER in self._pending:
+            before, self._meta = self._pending.split(STREAM_META_MARKER, 1)
+            self._pending = ""
+            return self._release(before.rstrip())
+
+        hold = 0
+        for n in range(min(len(self._pending), len(STREAM_META_MARKER) - 1), 0, -1):
+            if STREAM_META_MARKER.startswith(self._pending[-n:]):
+                hold = n
+                break
+        ready = self._pending[:len(self._pending) - hold].rstrip()
+        self._pending = self._pending[len(ready):]
+        return self._release(ready)
+
+    def _release(self, piece: str) -> str:
+        if not self.text:
+            piece = piece.lstrip()
+        self.text += piece
+        return piece
+
+    def finish(self, user_text: str) -> tuple[str, dict | None]:
+        """Return (remaining text, result); result is None if nothing usable arrived."""
+        if self._json is not None:
+            try:
+                result = _parse_model_reply(self._json)
+            except (ValueError, KeyError):
+                return "", None
+            self.text = result["response"]
+            return result["response"], result
+
+        tail = "" if self._meta is not None else self._release(self._pending.strip())
+        if not self.text:
+            return tail, None
+
+        try:
+            meta = json.loads(_strip_code_fence(self._meta or ""))
+        except ValueError:
+            meta = None
+        if not isinstance(meta, dict):
+            # No usable metadata: classify the user's message locally instead
+            detected = detect_emotion_rule_based(user_text)
+            meta = {
+                "emotion": detected.emotion,
+                "confidence": detected.confidence,
+                "sentiment_score": detected.sentiment_score,
+            }
+        return tail, _normalize_model_result(meta, self.text)
+
+
+async def _stream_gemini_bounded(prompt: AssembledPrompt):
+    """
+    Stream a Gemini reply under the same concurrency limit and deadline as
+    _run_gemini_bounded. Yields ("token", str) pieces, then ("result", dict)
+    for a complete reply or ("partial", dict) when the stream broke off after
+    some text was sent. Yields no result if nothing usable arrived.
+    """
+    call = _gemini_breaker.try_call()
+    if call is None:
+        return
+    record_prompt(prompt)
+    text, gemini_history = prompt.message, prompt.history
+
+    loop = asyncio.get_running_loop()
+    # The first chunk must arrive within the latency budget; the rest of the
+    # reply may take until the hard LLM_TIMEOUT_SECONDS deadline.
+    first_chunk_deadline = loop.time() + _LLM_BUDGET_SECONDS
+    deadline = loop.time() + LLM_TIMEOUT_SECONDS
+
+    try:
+        await asyncio.wait_for(_llm_slots.acquire(), _LLM_BUDGET_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Gemini concurrency limit reached, using fallback.")
+        call.finish(False)
+        return
+    except BaseException:
+        # Cancelled while waiting: see _run_gemini_bounded
+        call.finish(False)
+        raise
+
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def post(item: tuple) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stop.set()
+
+    def produce() -> None:
+        try:
+            chat = get_model("stream").start_chat(history=gemini_history)
+            for chunk in chat.send_message(text, stream=True, request_options={"timeout": LLM_TIMEOUT_SECONDS}):
+                if stop.is_set():
+                    return
+                post(("chunk", chunk.text))
+        except Exception as e:
+            logger.error(f"Gemini streaming failed: {e}")
+            post(("error", None))
+        else:
+            post(("end", None))
+
+    future = _llm_executor.submit(produce)
+    future.add_done_callback(lambda _: _release_llm_slot(loop))
+
+    splitter = _StreamSplitter()
+    completed = False
+    first_chunk = True
+    try:
+        while True:
+            wait_until = first_chunk_deadline if first_chunk else deadline
+            try:
+                kind, chunk = await asyncio.wait_for(queue.get(), max(0.0, wait_until - loop.time()))
+            except asyncio.TimeoutError:
+                logger.warning("Gemini stream exceeded its deadline.")
+                break
+            # Streams are judged on time to first chunk, not total length
+            call.finish(kind != "error")
+            if kind != "chunk":
+                completed = kind == "end"
+                break
+            first_chunk = False
+            piece = splitter.feed(chunk)
+            if piece:
+                yield "token", piece
+    finally:
+        # Client went away, deadline passed or the stream ended: stop the worker
+        stop.set()
+        future.cancel()
+        call.finish(False)  # no-op unless no chunk ever arrived
+
+    tail, result = splitter.finish(text)
+    if tail:
+        yield "token", tail
+    if result:
+        yield ("result" if completed else "partial"), result
+
+
+# ============================================================================
+# CONVERSATION SUMMARIES
+# ============================================================================
+
+def _format_transcript(messages: list[dict]) -> str:
+    return "\n".join(
+        f"{'friend' if m.get('is_ai_response') else 'user'}: {m.get('content', '')}"
+        for m in messages
+    )
+
+
+def summarize_with_gemini(previous_summary: str | None, messages: list[dict]) -> str | None:
+    """Fold messages ({"content", "is_ai_response"}) into the running notes."""
+    model = get_model("summary")
+    if not model:
+        return None
+    prompt = (
+        f"Previous notes:\n{previous_summary or '(none yet)'}\n\n"
+        f"Newer messages:\n{_format_transcript(messages)}"
+    )
+    try:
+        response = model.start_chat().send_message(prompt, request_options={"timeout": LLM_TIMEOUT_SECONDS})
+        return response.text.strip() or None
+    except Exception as e:
+        logger.error(f"Gemini summary failed: {e}")
+        return None
+
+
+async def summarize_conversation_async(previous_summary: str | None, messages: list[dict]) -> str | None:
+    """
+    Background variant of summarize_with_gemini. Shares the model pool's
+    concurrency limit, and is skipped while the breaker is not closed so
+    summaries never compete with replies for a struggling backend.
+    Returns None if no summary could be produced.
+    """
+    if _gemini_breaker.state != CLOSED or not await _get_model_async():
+        return None
+
+    loop = asyncio.get_running_loop()
+    await _llm_slots.acquire()
+    future = _llm_executor.submit(summarize_with_gemini, previous_summary, messages)
+    future.add_done_callback(lambda _: _release_llm_slot(loop))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), LLM_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Gemini summary timed out.")
+        return None
+
+
+# ============================================================================
+# MAIN ENTRY POINT
+# ============================================================================
+
+def _build_fallback_response(text: str) -> dict:
     logger.info("Using fallback specific rule-based system.")
     result = detect_emotion_rule_based(text)
     
@@ -692,3 +1229,88 @@ def generate_response(text: str, history: list = []) -> dict:
         "is_crisis": False,
     }
 
+
+def generate_response(text: str, history: list = [], summary: str | None = None) -> dict:
+    """
+    Main function to generate response.
+    Tries Gemini first, falls back to Rule-Based.
+    `summary` is the rolling summary of turns older than `history`, if any.
+    """
+    # Always check crisis locally first for safety/speed
+    if _check_crisis(text):
+        return _build_crisis_response(text)
+        
+    # Try Gemini
+    if get_model():
+        prompt = build_prompt(text, history, SYSTEM_PROMPT, summary)
+        cache_key = _response_cache_key(text, prompt.history)
+        cached = _get_cached_response(cache_key)
+        if cached:
+            return cached
+
+        call = _gemini_breaker.try_call()
+        if call:
+            record_prompt(prompt)
+            gemini_result = generate_response_with_gemini(text, prompt.history)
+            call.finish(gemini_result is not None)
+            if gemini_result:
+                _store_cached_response(cache_key, gemini_result)
+                return gemini_result
+
+    # Fallback to Rule-Based
+    return _build_fallback_response(text)
+
+
+async def generate_response_async(text: str, history: list = [], summary: str | None = None) -> dict:
+    """
+    Non-blocking variant of generate_response for request handlers.
+    The Gemini call runs on the model pool with a bounded concurrency and a
+    per-call deadline; on timeout or failure the rule-based fallback is used.
+    """
+    if _check_crisis(text):
+        return _build_crisis_response(text)
+
+    if await _get_model_async():
+        prompt = build_prompt(text, history, SYSTEM_PROMPT, summary)
+        cache_key = _response_cache_key(text, prompt.history)
+        cached = _get_cached_response(cache_key)
+        if cached:
+            return cached
+
+        gemini_result = await _run_gemini_bounded(prompt)
+        if gemini_result:
+            _store_cached_response(cache_key, gemini_result)
+            return gemini_result
+
+    return _build_fallback_response(text)
+
+
+async def stream_response_async(text: str, history: list = [], summary: str | None = None):
+    """
+    Streaming variant of generate_response_async.
+    Yields ("token", str) events as reply text becomes available, then one
+    ("result", dict) event with the same fields generate_response returns.
+    Crisis, cached and fallback replies arrive as a single token.
+    """
+    if _check_crisis(text):
+        result = _build_crisis_response(text)
+    else:
+        result = None
+        if await _get_model_async():
+            prompt = build_prompt(text, history, STREAM_SYSTEM_PROMPT, summary)
+            cache_key = _response_cache_key(text, prompt.history)
+            result = _get_cached_response(cache_key)
+            if result is None:
+                async for kind, payload in _stream_gemini_bounded(prompt):
+                    if kind == "token":
+                        yield kind, payload
+                        continue
+                    if kind == "result":
+                        _store_cached_response(cache_key, payload)
+                    yield "result", payload
+                    return
+        if result is None:
+            result = _build_fallback_response(text)
+
+    yield "token", result["response"]
+    yield "result", result
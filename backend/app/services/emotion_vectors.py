@@ -0,0 +1,240 @@
+"""
+Per-user emotion profile vectors for "people who feel like you".
+
+Each user has one row in a float32 matrix with a column per emotion in
+SENTIMENT_MAP. Every EmotionLog adds its intensity to its emotion's column,
+so frequent and strong emotions dominate. Older logs fade with a half-life
+of EMOTION_VECTOR_HALF_LIFE_DAYS.
+
+The decay never rewrites rows. A log is added with weight
+intensity * 2 ** ((created_at - epoch) / half_life), i.e. scaled up by how
+recent it is, instead of scaling every older log down as time passes. Every
+row then carries the same common factor relative to "now", and cosine
+similarity ignores common factors, so rankings match true time decay. When
+the weights approach float32 range, the matrix is rescaled once and the
+epoch moved forward. The epoch starts at the time the load begins, so
+historical logs weigh at most 1 and logs more than ~120 half-lives old
+count as zero, as they would under real decay.
+
+similar_users() is one matrix-vector product over all rows plus a partial
+sort (about a millisecond at 100k users). New logs update a single row in
+place.
+
+The matrix is built from emotion_logs in the background at startup, and
+`ready` is set only once that succeeds; a failed load is retried every
+_RETRY_SECONDS. Logs recorded while it loads are held by id and replayed
+afterwards, except those the load's SELECT already returned: record() is
+called after commit, so anything recorded before the SELECT starts is in
+its snapshot, and later ones are dropped if the stream yields their id.
+It belongs to one process, like presence and matching.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from app.config import EMOTION_VECTOR_HALF_LIFE_DAYS
+from app.database import async_session
+from app.models.models import EmotionLog
+from app.services.emotion_service import SENTIMENT_MAP
+
+logger = logging.getLogger(__name__)
+
+EMOTIONS = list(SENTIMENT_MAP)
+_COLUMN = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+_DEFAULT_INTENSITY = 0.5
+_MAX_LOG2_WEIGHT = 50.0  # rebase before a single log's weight passes 2**50
+_LOAD_CHUNK = 50_000
+_RETRY_SECONDS = 30.0
+
+
+class EmotionVectors:
+    def __init__(self, half_life_days: float):
+        self.half_life_seconds = half_life_days * 86400
+        self.ready = False
+        self._replay: dict[str, tuple] | None = None  # log id -> row, while loading
+        self._task: asyncio.Task | None = None
+        self._stats = {"logs_applied": 0, "queries": 0, "rebases": 0, "load_failures": 0, "load_seconds": 0.0}
+        self._reset()
+
+    def _reset(self) -> None:
+        self._epoch: datetime | None = None  # set when the first log is applied
+        self._matrix = np.zeros((1024, len(EMOTIONS)), dtype=np.float32)
+        self._norms = np.zeros(1024, dtype=np.float32)
+        self._row: dict[str, int] = {}
+        self._ids: list[str] = []
+
+    def _row_for(self, user_id: str) -> int:
+        row = self._row.get(user_id)
+        if row is None:
+            row = len(self._ids)
+            if row == len(self._matrix):
+                self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+                self._norms = np.concatenate([self._norms, np.zeros_like(self._norms)])
+            self._row[user_id] = row
+            self._ids.append(user_id)
+        return row
+
+    def _rebase(self, log2_shift: float) -> None:
+        """Move the epoch forward by log2_shift half-lives, scaling every row down to match."""
+        n = len(self._ids)
+        self._matrix[:n] *= np.float32(2.0 ** -log2_shift)
+        self._norms[:n] *= np.float32(2.0 ** -log2_shift)
+        self._epoch += timedelta(seconds=log2_shift * self.half_life_seconds)
+        self._stats["rebases"] += 1
+
+    def _apply(self, logs) -> None:
+        """Add (log_id, user_id, emotion, intensity, created_at) rows to the matrix."""
+        if self._epoch is None:
+            self._epoch = datetime.utcnow()
+        epoch = self._epoch
+        row_of = self._row
+        rows, cols, intensities, seconds = [], [], [], []
+        for _, user_id, emotion, intensity, created_at in logs:
+            col = _COLUMN.get(emotion)
+            if col is None:
+                continue
+            row = row_of.get(user_id)
+            rows.append(self._row_for(user_id) if row is None else row)
+            cols.append(col)
+            intensities.append(_DEFAULT_INTENSITY if intensity is None else intensity)
+            seconds.append((created_at - epoch).total_seconds())
+        if not rows:
+            return
+
+        log2_w = np.array(seconds) / self.half_life_seconds
+        if log2_w.max() > _MAX_LOG2_WEIGHT:
+            shift = float(log2_w.max())
+            self._rebase(shift)
+            log2_w -= shift
+        weights = (np.exp2(log2_w) * np.array(intensities)).astype(np.float32)
+        rows = np.array(rows)
+        np.add.at(self._matrix, (rows, np.array(cols)), weights)
+        touched = np.unique(rows)
+        # In float64: rows summing many recent logs can square past float32's ~2**128
+        self._norms[touched] = np.linalg.norm(self._matrix[touched].astype(np.float64), axis=1)
+        self._stats["logs_applied"] += len(weights)
+
+    def record(self, log_id: str, user_id: str, emotion: str, intensity: float | None, created_at: datetime) -> None:
+        """Add one newly committed log to its user's vector."""
+        if self._replay is not None:
+            self._replay[log_id] = (log_id, user_id, emotion, intensity, created_at)
+            return
+        col = _COLUMN.get(emotion)
+        if col is None:
+            return
+        if self._epoch is None:
+            self._epoch = datetime.utcnow()
+        log2_w = (created_at - self._epoch).total_seconds() / self.half_life_seconds
+        if log2_w > _MAX_LOG2_WEIGHT:
+            self._rebase(log2_w)
+            log2_w = 0.0
+        row = self._row_for(user_id)
+        vector = self._matrix[row]
+        vector[col] += (_DEFAULT_INTENSITY if intensity is None else intensity) * 2.0 ** log2_w
+        self._norms[row] = np.linalg.norm(vector.astype(np.float64))
+        self._stats["logs_applied"] += 1
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._replay = {}
+            self._task = asyncio.create_task(self._load())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _load(self) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                await self._load_once()
+            except Exception as e:
+                self._stats["load_failures"] += 1
+                logger.error(f"Loading emotion vectors failed, retrying in {_RETRY_SECONDS:g}s: {e}")
+                await asyncio.sleep(_RETRY_SECONDS)
+                continue
+            self._stats["load_seconds"] = time.perf_counter() - started
+            return
+
+    async def _load_once(self) -> None:
+        # Start clean: a failed attempt may have applied part of the table
+        self._reset()
+        self._epoch = datetime.utcnow()
+        replay = self._replay
+        # Everything recorded so far was committed before this SELECT starts
+        replay.clear()
+        async with async_session() as db:
+            result = await db.stream(
+                select(
+                    EmotionLog.id, EmotionLog.user_id, EmotionLog.emotion, EmotionLog.intensity, EmotionLog.created_at
+                ).execution_options(yield_per=_LOAD_CHUNK)
+            )
+            async for chunk in result.partitions(_LOAD_CHUNK):
+                if replay:
+                    for row in chunk:
+                        replay.pop(row[0], None)
+                self._apply(chunk)
+                await asyncio.sleep(0)  # let requests run between chunks
+        self._replay = None
+        if replay:
+            self._apply(list(replay.values()))
+        self.ready = True
+
+    def similar_users(self, user_id: str, exclude: set[str], limit: int) -> list[tuple[str, float]]:
+        """(user_id, cosine similarity) of the closest profiles, best first."""
+        self._stats["queries"] += 1
+        row = self._row.get(user_id)
+        if row is None or self._norms[row] == 0:
+            return []
+        n = len(self._ids)
+        query = self._matrix[row] / self._norms[row]
+        norms = self._norms[:n]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = (self._matrix[:n] @ query) / norms
+        scores[norms == 0] = -np.inf
+        scores[row] = -np.inf
+        for other in exclude:
+            other_row = self._row.get(other)
+            if other_row is not None:
+                scores[other_row] = -np.inf
+
+        k = min(limit, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # Vectors are non-negative, so 0 means no emotion in common
+        return [(self._ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def profile(self, user_id: str) -> dict[str, float]:
+        """The user's normalised vector as {emotion: share}, for display."""
+        row = self._row.get(user_id)
+        if row is None or self._norms[row] == 0:
+            return {}
+        values = self._matrix[row] / self._matrix[row].sum()
+        return {emotion: round(float(v), 4) for emotion, v in zip(EMOTIONS, values) if v > 0}
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "users": len(self._ids),
+            "dimensions": len(EMOTIONS),
+            "matrix_bytes": int(self._matrix.nbytes + self._norms.nbytes),
+            "half_life_days": self.half_life_seconds / 86400,
+            "logs_applied": self._stats["logs_applied"],
+            "queries": self._stats["queries"],
+            "rebases": self._stats["rebases"],
+            "load_failures": self._stats["load_failures"],
+            "load_seconds": round(self._stats["load_seconds"], 2),
+        }
+
+
+emotion_vectors = EmotionVectors(EMOTION_VECTOR_HALF_LIFE_DAYS)
@@ -0,0 +1,93 @@
+"""
+Local stand-in for google.generativeai.GenerativeModel.
+
+Implements the small part of the SDK surface emotion_service uses
+(start_chat -> send_message, optionally streamed) so the chat endpoints can
+be exercised and timed without network access. Replies are canned per
+rule-based emotion and delivered in word-sized chunks with configurable delays.
+Enabled with LLM_BACKEND=fake.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+
+FAKE_REPLIES = {
+    "happy": "love that for you! what's been the best part so far?",
+    "sad": "ugh, that sounds really heavy. i'm here, want to tell me what happened?",
+    "anxious": "okay, deep breath with me. what's the thing your brain keeps looping on rn?",
+    "angry": "yeah that would make me mad too lol. what set it off?",
+    "tired": "sounds like you're running on fumes. when did you last get a proper break?",
+    "neutral": "heyy, what's up? anything on your mind today?",
+}
+
+
+@dataclass
+class FakeChunk:
+    text: str
+
+
+class FakeChatSession:
+    def __init__(self, model: "FakeGenerativeModel", history: list | None = None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream: bool = False, **kwargs):
+        message = content if isinstance(content, str) else str(content)
+        if stream:
+            return self._stream(message)
+        if self.model.plain_text:
+            time.sleep(self.model.first_chunk_delay)
+            return FakeChunk(self.model.summary_for(message))
+        # A blocking call returns only once the whole reply has been generated
+        reply = self.model.reply_for(message)
+        words = reply["response"].count(" ") + 1
+        time.sleep(self.model.first_chunk_delay + self.model.chunk_delay * (words - 1))
+        return FakeChunk(json.dumps(reply))
+
+    def _stream(self, message: str):
+        reply = self.model.reply_for(message)
+        time.sleep(self.model.first_chunk_delay)
+        words = reply["response"].split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.model.chunk_delay)
+            yield FakeChunk(word if i == 0 else " " + word)
+        meta = {key: value for key, value in reply.items() if key != "response"}
+        yield FakeChunk("\n###META###" + json.dumps(meta))
+
+
+class FakeGenerativeModel:
+    def __init__(
+        self,
+        first_chunk_delay: float = 0.2,
+        chunk_delay: float = 0.03,
+        system_instruction: str | None = None,
+        plain_text: bool = False,
+        **kwargs,
+    ):
+        self.model_name = "fake"
+        self.system_instruction = system_instruction
+        self.plain_text = plain_text  # summary-style calls answer in prose
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_delay = chunk_delay
+
+    def start_chat(self, history: list | None = None) -> FakeChatSession:
+        return FakeChatSession(self, history)
+
+    def summary_for(self, prompt: str) -> str:
+        # Keep the tail of the transcript, roughly as a real summary would
+        return " ".join(prompt.split())[-600:]
+
+    def reply_for(self, prompt: str) -> dict:
+        # Imported lazily: emotion_service imports this module.
+        from app.services.emotion_service import detect_emotion_rule_based
+
+        result = detect_emotion_rule_based(prompt)
+        return {
+            "emotion": result.emotion,
+            "confidence": result.confidence,
+            "sentiment_score": result.sentiment_score,
+            "response": FAKE_REPLIES.get(result.emotion, FAKE_REPLIES["neutral"]),
+            "coping_tip": "Take a slow breath and drink some water.",
+        }
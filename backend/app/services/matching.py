@@ -0,0 +1,195 @@
+"""
+Ranked matching for /api/connect/discover.
+
+Holds in-memory inverted indexes from mood and interest to the users who
+have them, plus a list of recently active users. Each index is ordered by
+recency, and a lookup reads at most MATCH_CANDIDATES_PER_KEY users from
+each list it touches. The cost of a discover call therefore depends on
+those caps and on the user's own interests, not on how many users exist.
+
+Candidates are scored on a shared mood and on each shared interest. Pages
+are cut by (score, user id), which doesn't change between page fetches, so
+paging never repeats or skips anyone. Being online (from the presence
+registry) only breaks ties: within a page, online users come first among
+equal scores. Counting it in the score would move users between pages as
+they come and go.
+
+People the user already has a connection with (any status, either
+direction) are skipped while candidates are read, so they don't use up
+the per-key cap. Profile columns for the page of results are read from
+the database by primary key.
+
+The indexes are built from the database at startup and updated in place
+whenever a user registers or their mood or interests change. They belong
+to one process, like presence.
+"""
+
+import base64
+import heapq
+import json
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import MATCH_CANDIDATES_PER_KEY
+from app.models.models import User, UserInterest
+from app.services.presence import presence
+
+MOOD_WEIGHT = 3.0
+INTEREST_WEIGHT = 1.0
+
+
+def normalize_interest(interest: str) -> str:
+    return " ".join(interest.lower().split())
+
+
+def encode_match_cursor(score: float, user_id: str) -> str:
+    raw = json.dumps([score, user_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_match_cursor(cursor: str) -> tuple[float, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, user_id = json.loads(raw)
+        return float(score), str(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class MatchIndex:
+    def __init__(self, candidates_per_key: int):
+        self.candidates_per_key = candidates_per_key
+        self._by_mood: dict[str, OrderedDict[str, None]] = {}
+        self._by_interest: dict[str, OrderedDict[str, None]] = {}
+        self._recent: OrderedDict[str, None] = OrderedDict()
+        self._mood: dict[str, str] = {}
+        self._interests: dict[str, frozenset[str]] = {}
+
+    async def load(self, db: AsyncSession) -> None:
+        """Rebuild every index from the users and user_interests tables."""
+        self._by_mood.clear()
+        self._by_interest.clear()
+        self._recent.clear()
+        self._mood.clear()
+        self._interests.clear()
+
+        users = await db.execute(select(User.id, User.current_mood).order_by(User.updated_at))
+        for user_id, mood in users.all():
+            self.add_user(user_id, mood)
+        interests: dict[str, set[str]] = {}
+        for user_id, interest in (await db.execute(select(UserInterest.user_id, UserInterest.interest))).all():
+            interests.setdefault(user_id, set()).add(interest)
+        for user_id, values in interests.items():
+            self.set_interests(user_id, values)
+
+    def add_user(self, user_id: str, mood: str | None = None) -> None:
+        self._touch(self._recent, user_id)
+        self.set_mood(user_id, mood)
+
+    def set_mood(self, user_id: str, mood: str | None) -> None:
+        previous = self._mood.pop(user_id, None)
+        if previous is not None:
+            self._discard(self._by_mood, previous, user_id)
+        if mood:
+            self._mood[user_id] = mood
+            self._touch(self._by_mood.setdefault(mood, OrderedDict()), user_id)
+        self._touch(self._recent, user_id)
+
+    def set_interests(self, user_id: str, interests) -> None:
+        new = frozenset(normalize_interest(i) for i in interests if i.strip())
+        old = self._interests.pop(user_id, frozenset())
+        for interest in old - new:
+            self._discard(self._by_interest, interest, user_id)
+        for interest in new:
+            self._touch(self._by_interest.setdefault(interest, OrderedDict()), user_id)
+        if new:
+            self._interests[user_id] = new
+
+    @staticmethod
+    def _touch(posting: OrderedDict, user_id: str) -> None:
+        posting[user_id] = None
+        posting.move_to_end(user_id)
+
+    @staticmethod
+    def _discard(index: dict[str, OrderedDict], key: str, user_id: str) -> None:
+        posting = index.get(key)
+        if posting is not None:
+            posting.pop(user_id, None)
+            if not posting:
+                del index[key]
+
+    def _most_recent(self, posting: OrderedDict | None, skip: set[str]):
+        if not posting:
+            return []
+        users = []
+        for user_id in reversed(posting):
+            if user_id in skip:
+                continue
+            users.append(user_id)
+            if len(users) >= self.candidates_per_key:
+                break
+        return users
+
+    def rank(
+        self,
+        user_id: str,
+        exclude: set[str],
+        mood: str | None = None,
+        after: tuple[float, str] | None = None,
+        limit: int = 20,
+    ) -> tuple[list[tuple[float, str, list[str]]], tuple[float, str] | None]:
+        """
+        One page of (score, user_id, shared interests), best first, and the
+        (score, user_id) to pass as `after` for the next page (None on the
+        last page). With `mood`, only users currently in that mood are
+        considered.
+        """
+        my_mood = self._mood.get(user_id)
+        my_interests = self._interests.get(user_id, frozenset())
+        skip = exclude | {user_id}
+
+        # Scores accumulate straight off the posting lists
+        scores: dict[str, float] = {}
+        if mood:
+            base = MOOD_WEIGHT if mood == my_mood else 0.0
+            for other in self._most_recent(self._by_mood.get(mood), skip):
+                shared = my_interests & self._interests.get(other, frozenset())
+                scores[other] = base + INTEREST_WEIGHT * len(shared)
+        else:
+            if my_mood:
+                for other in self._most_recent(self._by_mood.get(my_mood), skip):
+                    scores[other] = MOOD_WEIGHT
+            for interest in my_interests:
+                for other in self._most_recent(self._by_interest.get(interest), skip):
+                    scores[other] = scores.get(other, 0.0) + INTEREST_WEIGHT
+            for other in self._most_recent(self._recent, skip):
+                scores.setdefault(other, 0.0)
+
+        keys = ((-score, other) for other, score in scores.items())
+        if after is not None:
+            bound = (-after[0], after[1])
+            keys = (key for key in keys if key > bound)
+        top = heapq.nsmallest(limit + 1, keys)
+        page = top[:limit]
+        next_after = (-page[-1][0], page[-1][1]) if len(top) > limit else None
+
+        online = presence.online_users()
+        page.sort(key=lambda key: (key[0], key[1] not in online, key[1]))
+        return [
+            (-neg_score, other, sorted(my_interests & self._interests.get(other, frozenset())))
+            for neg_score, other in page
+        ], next_after
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._recent),
+            "moods": len(self._by_mood),
+            "interests": len(self._by_interest),
+            "candidates_per_key": self.candidates_per_key,
+        }
+
+
+match_index = MatchIndex(MATCH_CANDIDATES_PER_KEY)
@@ -0,0 +1,135 @@
+"""
+Downsampled mood timeline over EmotionLog.
+
+Logs are grouped into hour, day or week buckets by the database (GROUP BY
+on a truncated created_at), giving per bucket the count of each emotion,
+the mean intensity and the mean sentiment. Logs carry no sentiment score of
+their own, so it comes from SENTIMENT_MAP, as for rule-based detection.
+
+Buckets that have closed cannot change again, so they are cached per
+(user, bucket size) together with the range they cover. A request only
+aggregates the logs after that range: the open bucket and any buckets that
+have closed since. A long chart then costs about as much as a short one.
+With write-behind on, a bucket counts as closed only after two flush
+intervals, so queued logs land before it is cached.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    TIMELINE_CACHE_MAX_ENTRIES,
+    TIMELINE_CACHE_TTL_SECONDS,
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+)
+from app.database import engine
+from app.models.models import EmotionLog
+from app.services.emotion_service import SENTIMENT_MAP
+from app.utils.cache import TTLCache
+
+BUCKET_SIZES = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+
+_SETTLE = timedelta(seconds=2 * WRITE_BEHIND_FLUSH_INTERVAL_SECONDS if WRITE_BEHIND_ENABLED else 0)
+
+_sentiment = case(SENTIMENT_MAP, value=EmotionLog.emotion, else_=-0.3)
+
+
+@dataclass
+class _ClosedBuckets:
+    covers_from: datetime
+    covers_through: datetime  # every closed bucket starting in [covers_from, covers_through) is in buckets
+    buckets: dict[datetime, dict] = field(default_factory=dict)
+
+
+_closed_cache = TTLCache(TIMELINE_CACHE_MAX_ENTRIES, TIMELINE_CACHE_TTL_SECONDS)
+
+
+def bucket_start(ts: datetime, size: str) -> datetime:
+    """Start of the bucket containing ts; weeks start on Monday."""
+    if size == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if size == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _bucket_expr(size: str):
+    column = EmotionLog.created_at
+    if engine.dialect.name == "postgresql":
+        return func.date_trunc(size, column)
+    if size == "hour":
+        return func.strftime("%Y-%m-%d %H:00:00", column)
+    if size == "week":
+        # Back six days, then forward to the next Monday: the week's Monday
+        return func.strftime("%Y-%m-%d 00:00:00", column, "-6 days", "weekday 1")
+    return func.strftime("%Y-%m-%d 00:00:00", column)
+
+
+async def _aggregate(db: AsyncSession, user_id: str, size: str, since: datetime) -> dict[datetime, dict]:
+    bucket = _bucket_expr(size).label("bucket")
+    result = await db.execute(
+        select(
+            bucket,
+            EmotionLog.emotion,
+            func.count(EmotionLog.id),
+            func.sum(EmotionLog.intensity),
+            func.count(EmotionLog.intensity),
+            func.sum(_sentiment),
+        )
+        .where(EmotionLog.user_id == user_id, EmotionLog.created_at >= since)
+        .group_by(bucket, EmotionLog.emotion)
+    )
+
+    sums: dict[datetime, dict] = {}
+    for start, emotion, count, intensity_sum, intensity_count, sentiment_sum in result.all():
+        if not isinstance(start, datetime):
+            start = datetime.fromisoformat(start)
+        acc = sums.setdefault(start, {"emotions": {}, "count": 0, "intensity": 0.0, "rated": 0, "sentiment": 0.0})
+        acc["emotions"][emotion] = count
+        acc["count"] += count
+        acc["intensity"] += intensity_sum or 0.0
+        acc["rated"] += intensity_count
+        acc["sentiment"] += sentiment_sum or 0.0
+
+    return {
+        start: {
+            "start": start.isoformat(),
+            "count": acc["count"],
+            "emotions": acc["emotions"],
+            "mean_intensity": round(acc["intensity"] / acc["rated"], 3) if acc["rated"] else None,
+            "mean_sentiment": round(acc["sentiment"] / acc["count"], 3),
+        }
+        for start, acc in sums.items()
+    }
+
+
+async def mood_timeline(db: AsyncSession, user_id: str, size: str, since: datetime) -> list[dict]:
+    """Non-empty buckets from the one containing `since` up to now, oldest first."""
+    now = datetime.utcnow()
+    start = bucket_start(since, size)
+    closed_through = bucket_start(now - _SETTLE, size)
+
+    key = (user_id, size)
+    entry = _closed_cache.get(key)
+    if entry is None or not entry.covers_from <= start <= entry.covers_through:
+        entry = _ClosedBuckets(covers_from=start, covers_through=start)
+
+    fresh = await _aggregate(db, user_id, size, entry.covers_through)
+    for bucket, data in fresh.items():
+        if bucket < closed_through:
+            entry.buckets[bucket] = data
+    entry.covers_through = max(entry.covers_through, closed_through)
+    _closed_cache.set(key, entry)
+
+    merged = {b: data for b, data in entry.buckets.items() if b >= start}
+    merged.update(fresh)
+    return [merged[b] for b in sorted(merged)]
+
+
+def timeline_cache_stats() -> dict:
+    return _closed_cache.stats()
@@ -0,0 +1,173 @@
+"""
+Presence registry behind User.is_online.
+
+A user is online while they have a /ws or /events connection open, and for
+PRESENCE_TTL_SECONDS after their last authenticated request or connection
+close. Every authenticated request counts as a heartbeat: a dict update,
+with no database write. API responses read is_online from here.
+
+users.is_online is kept for anything that reads the table directly. It is
+not written on every heartbeat. Every PRESENCE_SWEEP_SECONDS, a background
+task expires stale users and writes the accumulated online/offline changes
+as at most two bulk UPDATEs. Startup clears flags left over from the last
+run, and shutdown marks everyone tracked here offline.
+
+The registry belongs to one process. With several workers, each worker
+only sees its own users.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from sqlalchemy import update
+
+from app.config import PRESENCE_TTL_SECONDS, PRESENCE_SWEEP_SECONDS
+from app.database import async_session
+from app.models.models import User
+
+logger = logging.getLogger(__name__)
+
+_UPDATE_CHUNK = 500  # ids per UPDATE ... WHERE id IN (...)
+
+
+class PresenceRegistry:
+    def __init__(self, ttl_seconds: float, sweep_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.sweep_seconds = sweep_seconds
+        # user_id -> last activity, least recent first
+        self._last_seen: OrderedDict[str, float] = OrderedDict()
+        self._connections: dict[str, int] = {}
+        # user_id -> is_online value not yet written to users
+        self._changes: dict[str, bool] = {}
+        self._task: asyncio.Task | None = None
+        self._stats = {"heartbeats": 0, "flushes": 0, "rows_written": 0, "failures": 0, "last_flush_ms": 0.0}
+
+    def heartbeat(self, user_id: str) -> None:
+        self._stats["heartbeats"] += 1
+        if user_id not in self._last_seen:
+            self._changes[user_id] = True
+        self._last_seen[user_id] = time.monotonic()
+        self._last_seen.move_to_end(user_id)
+
+    def connect(self, user_id: str) -> None:
+        self._connections[user_id] = self._connections.get(user_id, 0) + 1
+        self.heartbeat(user_id)
+
+    def disconnect(self, user_id: str) -> None:
+        remaining = self._connections.get(user_id, 0) - 1
+        if remaining > 0:
+            self._connections[user_id] = remaining
+        else:
+            self._connections.pop(user_id, None)
+        # The TTL grace period starts now, so a quick reconnect never shows offline
+        self.heartbeat(user_id)
+
+    def is_online(self, user_id: str) -> bool:
+        if user_id in self._connections:
+            return True
+        seen = self._last_seen.get(user_id)
+        return seen is not None and time.monotonic() - seen < self.ttl_seconds
+
+    def online_users(self):
+        """
+        Live view of online user ids for bulk membership tests. Connected
+        users are always included; others are as of the last sweep, so it
+        can lag is_online() by up to PRESENCE_SWEEP_SECONDS.
+        """
+        return self._last_seen.keys()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        cutoff = now - self.ttl_seconds
+        while self._last_seen:
+            user_id, seen = next(iter(self._last_seen.items()))
+            if seen >= cutoff:
+                break
+            if user_id in self._connections:
+                # Still connected: an open connection is its own heartbeat
+                self._last_seen[user_id] = now
+                self._last_seen.move_to_end(user_id)
+                continue
+            del self._last_seen[user_id]
+            self._changes[user_id] = False
+
+    async def flush(self) -> None:
+        """Expire stale users and write pending is_online changes in bulk."""
+        self._expire()
+        if not self._changes:
+            return
+        changes, self._changes = self._changes, {}
+
+        started = time.perf_counter()
+        try:
+            async with async_session() as db:
+                for value in (True, False):
+                    ids = [user_id for user_id, online in changes.items() if online is value]
+                    for i in range(0, len(ids), _UPDATE_CHUNK):
+                        # Presence isn't a profile edit, so leave updated_at alone
+                        await db.execute(
+                            update(User)
+                            .where(User.id.in_(ids[i:i + _UPDATE_CHUNK]))
+                            .values(is_online=value, updated_at=User.updated_at)
+                        )
+                await db.commit()
+        except Exception as e:
+            # Keep the batch for the next sweep; newer changes win
+            for user_id, online in changes.items():
+                self._changes.setdefault(user_id, online)
+            self._stats["failures"] += 1
+            logger.error(f"Presence flush of {len(changes)} changes failed: {e}")
+            return
+
+        self._stats["flushes"] += 1
+        self._stats["rows_written"] += len(changes)
+        self._stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+
+    async def start(self) -> None:
+        # Flags from a previous run are stale: nobody is connected yet
+        async with async_session() as db:
+            await db.execute(
+                update(User).where(User.is_online.is_(True)).values(is_online=False, updated_at=User.updated_at)
+            )
+            await db.commit()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for user_id in self._last_seen:
+            self._changes[user_id] = False
+        self._last_seen.clear()
+        self._connections.clear()
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_seconds)
+            await self.flush()
+
+    def stats(self) -> dict:
+        self._expire()
+        return {
+            "online": len(self._last_seen),
+            "connected": len(self._connections),
+            "pending_changes": len(self._changes),
+            "ttl_seconds": self.ttl_seconds,
+            "sweep_seconds": self.sweep_seconds,
+            "heartbeats": self._stats["heartbeats"],
+            "flushes": self._stats["flushes"],
+            "rows_written": self._stats["rows_written"],
+            "failures": self._stats["failures"],
+            "last_flush_ms": round(self._stats["last_flush_ms"], 1),
+        }
+
+
+presence = PresenceRegistry(PRESENCE_TTL_SECONDS, PRESENCE_SWEEP_SECONDS)
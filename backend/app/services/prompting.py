@@ -0,0 +1,135 @@
+"""
+Prompt assembly for Gemini calls.
+
+The persona/format rules are set once per model as a system instruction, so
+each call only carries the conversation summary (if any), the recent chat
+history and the new user message. This module turns stored chat rows into
+Gemini history under a token budget and keeps running size statistics for
+/api/metrics.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+
+from app.config import PROMPT_HISTORY_MAX_TURNS, PROMPT_HISTORY_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class AssembledPrompt:
+    history: list[dict]
+    message: str
+    system_tokens: int
+    history_tokens: int
+    message_tokens: int
+    dropped_turns: int
+    summary_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.system_tokens + self.summary_tokens + self.history_tokens + self.message_tokens
+
+
+class PromptStats:
+    """Running totals of assembled prompt sizes (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.trimmed_calls = 0
+        self.dropped_turns = 0
+
+    def record(self, prompt: AssembledPrompt) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_tokens += prompt.total_tokens
+            self.max_tokens = max(self.max_tokens, prompt.total_tokens)
+            if prompt.dropped_turns:
+                self.trimmed_calls += 1
+                self.dropped_turns += prompt.dropped_turns
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "avg_tokens": round(self.total_tokens / self.calls, 1) if self.calls else 0.0,
+                "max_tokens": self.max_tokens,
+                "trimmed_calls": self.trimmed_calls,
+                "dropped_turns": self.dropped_turns,
+                "history_token_budget": PROMPT_HISTORY_TOKEN_BUDGET,
+                "history_max_turns": PROMPT_HISTORY_MAX_TURNS,
+            }
+
+
+prompt_stats = PromptStats()
+
+
+def _history_window(history: list) -> tuple[list[dict], int]:
+    """Newest turns that fit the turn and token budgets, plus the number dropped."""
+    window = history[-PROMPT_HISTORY_MAX_TURNS:]
+    kept = []
+    used = 0
+    for msg in reversed(window):
+        content = msg.get("content", "")
+        tokens = estimate_tokens(content)
+        if used + tokens > PROMPT_HISTORY_TOKEN_BUDGET:
+            break
+        role = "model" if msg.get("is_ai_response") else "user"
+        kept.append({"role": role, "parts": [content]})
+        used += tokens
+    kept.reverse()
+
+    # Gemini expects the history to open with a user turn
+    while kept and kept[0]["role"] == "model":
+        kept.pop(0)
+    return kept, len(window) - len(kept)
+
+
+def _summary_turns(summary: str) -> list[dict]:
+    # Gemini has no slot for extra context between the system instruction and
+    # the chat, so the summary goes in as an opening exchange
+    return [
+        {"role": "user", "parts": [f"(Notes from our earlier conversation: {summary})"]},
+        {"role": "model", "parts": ["got it"]},
+    ]
+
+
+def build_prompt(text: str, history: list, system_instruction: str, summary: str | None = None) -> AssembledPrompt:
+    """
+    Assemble one call from the rolling conversation summary, chat rows
+    ({"content", "is_ai_response"}, oldest first) and the new user message.
+    The system instruction is not part of the payload (it is set on the
+    model) but is counted for reporting.
+    """
+    gemini_history, dropped = _history_window(history)
+    summary_history = _summary_turns(summary) if summary else []
+    return AssembledPrompt(
+        history=summary_history + gemini_history,
+        message=text,
+        system_tokens=estimate_tokens(system_instruction),
+        history_tokens=sum(estimate_tokens(turn["parts"][0]) for turn in gemini_history),
+        message_tokens=estimate_tokens(text),
+        dropped_turns=dropped,
+        summary_tokens=sum(estimate_tokens(turn["parts"][0]) for turn in summary_history),
+    )
+
+
+def record_prompt(prompt: AssembledPrompt) -> None:
+    """Log and count a prompt that is actually being sent to the model."""
+    prompt_stats.record(prompt)
+    logger.debug(
+        f"Prompt: {prompt.total_tokens} tokens "
+        f"(system {prompt.system_tokens}, summary {prompt.summary_tokens}, "
+        f"history {prompt.history_tokens} over "
+        f"{len(prompt.history)} turns, message {prompt.message_tokens}, "
+        f"dropped {prompt.dropped_turns})"
+    )
@@ -0,0 +1,199 @@
+"""
+Real-time push of events to connected users.
+
+Handlers publish an event addressed to a user id. The hub hands it to every
+live connection that user has open in this process. Clients subscribe via
+the /api/connect/ws WebSocket or the /api/connect/events event stream.
+
+Publishing always goes through a fan-out backend, which then calls every
+process's hub to deliver the event. The default InProcessBackend simply loops
+back, which is all a single worker needs. A broker-backed backend (Redis
+pub/sub, PostgreSQL LISTEN/NOTIFY) can implement the same three methods to
+span workers; pick one with REALTIME_BACKEND.
+
+Each connection has a bounded queue. When a client stops reading, its oldest
+undelivered events are dropped (and counted) rather than holding memory or
+blocking publishers.
+
+Shutting down closes every subscription, so open streams end. uvicorn waits
+for open responses to finish before it runs lifespan shutdown, so the hub
+also closes them as soon as SIGINT/SIGTERM arrives; otherwise an open
+/events stream would hold up shutdown and --reload indefinitely.
+"""
+
+import asyncio
+import logging
+import signal
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from app.config import REALTIME_BACKEND, REALTIME_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class FanoutBackend(ABC):
+    """Carries published events to the hub of every process."""
+
+    @abstractmethod
+    async def start(self, deliver: Callable[[str, dict], None]) -> None:
+        """Begin passing every published event to deliver(user_id, event)."""
+
+    @abstractmethod
+    async def publish(self, user_id: str, event: dict) -> None:
+        """Send an event towards every process's hub."""
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Stop delivering and release any connections."""
+
+
+class InProcessBackend(FanoutBackend):
+    """Single-process fan-out: published events go straight to the local hub."""
+
+    def __init__(self):
+        self._deliver: Callable[[str, dict], None] | None = None
+
+    async def start(self, deliver: Callable[[str, dict], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, user_id: str, event: dict) -> None:
+        if self._deliver is not None:
+            self._deliver(user_id, event)
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+
+_BACKENDS: dict[str, Callable[[], FanoutBackend]] = {
+    "memory": InProcessBackend,
+}
+
+
+class Subscription:
+    """One live connection's queue of events."""
+
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.dropped = 0
+        self.closed = False
+        self._queue: asyncio.Queue[dict | None] = asyncio.Queue(queue_size)
+
+    async def get(self) -> dict | None:
+        """The next event, or None once the subscription is closed."""
+        return await self._queue.get()
+
+    def put(self, event: dict | None) -> None:
+        if self.closed:
+            return
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    def close(self) -> None:
+        self.put(None)
+        self.closed = True
+
+
+class Hub:
+    def __init__(self, backend: FanoutBackend, queue_size: int):
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._previous_handlers: dict[int, object] = {}
+        self._closing = False
+        self._stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    async def start(self) -> None:
+        self._closing = False
+        self._install_signal_handlers()
+        await self.backend.start(self._deliver)
+
+    async def stop(self) -> None:
+        self.close_subscriptions()
+        self._restore_signal_handlers()
+        await self.backend.stop()
+
+    def close_subscriptions(self) -> None:
+        """End every open stream; new subscriptions start closed from now on."""
+        self._closing = True
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                subscription.close()
+
+    def _install_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        def handler(signum, frame):
+            loop.call_soon_threadsafe(self.close_subscriptions)
+            previous = self._previous_handlers.get(signum)
+            if callable(previous):
+                previous(signum, frame)
+            elif previous == signal.SIG_DFL:
+                signal.signal(signum, signal.SIG_DFL)
+                signal.raise_signal(signum)
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                # Chains to the server's own handler (asyncio's or uvicorn's), which still runs
+                self._previous_handlers[sig] = signal.signal(sig, handler)
+            except ValueError:
+                return  # Not the main thread: rely on stop()
+
+    def _restore_signal_handlers(self) -> None:
+        for sig, previous in self._previous_handlers.items():
+            try:
+                signal.signal(sig, previous)
+            except (ValueError, TypeError):
+                pass
+        self._previous_handlers.clear()
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        if self._closing:
+            subscription.close()
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._stats["dropped"] += subscription.dropped
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    async def publish(self, user_id: str, event_type: str, data: dict) -> None:
+        """Send {"type": event_type, "data": data} to all of the user's connections."""
+        self._stats["published"] += 1
+        try:
+            await self.backend.publish(user_id, {"type": event_type, "data": data})
+        except Exception as e:
+            # Real-time push is best effort; the data is already saved
+            logger.error(f"Realtime publish of {event_type} failed: {e}")
+
+    def _deliver(self, user_id: str, event: dict) -> None:
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.put(event)
+            self._stats["delivered"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": REALTIME_BACKEND,
+            "users": len(self._subscribers),
+            "connections": sum(len(s) for s in self._subscribers.values()),
+            "published": self._stats["published"],
+            "delivered": self._stats["delivered"],
+            "dropped": self._stats["dropped"]
+            + sum(sub.dropped for subs in self._subscribers.values() for sub in subs),
+        }
+
+
+def _make_backend(name: str) -> FanoutBackend:
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown REALTIME_BACKEND {name!r}; expected one of {', '.join(_BACKENDS)}")
+    return _BACKENDS[name]()
+
+
+hub = Hub(_make_backend(REALTIME_BACKEND), REALTIME_QUEUE_SIZE)
@@ -0,0 +1,159 @@
+"""
+Warm per-user conversation windows.
+
+The chat endpoints need the user's last few turns (plus the rolling summary
+of older ones) as model context. Instead of querying the DB on every request,
+the window is kept in memory after the first load and new turns are appended
+as they are saved. Sessions are
+evicted least-recently-used when the pool exceeds its session or memory cap,
+and dropped after sitting idle; the next request then reloads from the DB.
+
+Used from the event loop only, so no locking.
+"""
+
+import sys
+import time
+from collections import OrderedDict, deque
+
+from app.config import (
+    PROMPT_HISTORY_MAX_TURNS,
+    SESSION_POOL_MAX_SESSIONS,
+    SESSION_POOL_IDLE_SECONDS,
+    SESSION_POOL_MAX_BYTES,
+)
+
+
+def _turn_size(turn: dict) -> int:
+    return sys.getsizeof(turn) + sys.getsizeof(turn["content"])
+
+
+class ConversationSession:
+    def __init__(self, turns: list[dict], max_turns: int, summary: str | None = None):
+        self.turns: deque[dict] = deque(maxlen=max_turns)
+        self.summary = summary
+        self.size = sys.getsizeof(summary) if summary else 0
+        self.last_used = time.monotonic()
+        for turn in turns:
+            self.append(turn)
+
+    def append(self, turn: dict) -> int:
+        """Add a turn, returning the change in size (the oldest turn may fall out)."""
+        before = self.size
+        if len(self.turns) == self.turns.maxlen:
+            self.size -= _turn_size(self.turns[0])
+        self.turns.append(turn)
+        self.size += _turn_size(turn)
+        return self.size - before
+
+    def set_summary(self, summary: str) -> int:
+        """Replace the summary, returning the change in size."""
+        delta = sys.getsizeof(summary) - (sys.getsizeof(self.summary) if self.summary else 0)
+        self.summary = summary
+        self.size += delta
+        return delta
+
+
+class SessionPool:
+    def __init__(self, max_sessions: int, idle_seconds: float, max_bytes: int, max_turns: int):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self._sessions: OrderedDict[str, ConversationSession] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, user_id: str) -> tuple[list[dict], str | None] | None:
+        """Return (recent turns oldest first, summary), or None on a miss."""
+        session = self._sessions.get(user_id)
+        now = time.monotonic()
+        if session is not None and now - session.last_used > self.idle_seconds:
+            self._remove(user_id)
+            self.expirations += 1
+            session = None
+        if session is None:
+            self.misses += 1
+            return None
+        session.last_used = now
+        self._sessions.move_to_end(user_id)
+        self.hits += 1
+        return list(session.turns), session.summary
+
+    def put(self, user_id: str, turns: list[dict], summary: str | None = None) -> None:
+        """Install a window freshly loaded from the DB."""
+        if self.max_sessions <= 0:
+            return
+        self._remove(user_id)
+        session = ConversationSession(turns, self.max_turns, summary)
+        self._sessions[user_id] = session
+        self.bytes += session.size
+        self._enforce_limits()
+
+    def append(self, user_id: str, content: str, is_ai_response: bool) -> None:
+        """Add a saved turn to a warm session; cold users are loaded on their next request."""
+        session = self._sessions.get(user_id)
+        if session is None:
+            return
+        self.bytes += session.append({"content": content, "is_ai_response": is_ai_response})
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(user_id)
+        self._enforce_limits()
+
+    def set_summary(self, user_id: str, summary: str) -> None:
+        session = self._sessions.get(user_id)
+        if session is None:
+            return
+        self.bytes += session.set_summary(summary)
+        self._enforce_limits()
+
+    def invalidate(self, user_id: str) -> None:
+        self._remove(user_id)
+
+    def clear(self) -> None:
+        self._sessions.clear()
+        self.bytes = 0
+
+    def _remove(self, user_id: str) -> None:
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            self.bytes -= session.size
+
+    def _enforce_limits(self) -> None:
+        # Sessions are kept in last-used order, so idle ones sit at the front
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.last_used > cutoff:
+                break
+            self._remove(user_id)
+            self.expirations += 1
+        while self._sessions and (len(self._sessions) > self.max_sessions or self.bytes > self.max_bytes):
+            _, session = self._sessions.popitem(last=False)
+            self.bytes -= session.size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "idle_seconds": self.idle_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+session_pool = SessionPool(
+    SESSION_POOL_MAX_SESSIONS,
+    SESSION_POOL_IDLE_SECONDS,
+    SESSION_POOL_MAX_BYTES,
+    PROMPT_HISTORY_MAX_TURNS,
+)
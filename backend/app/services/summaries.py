@@ -0,0 +1,105 @@
+"""
+Rolling per-user conversation summaries.
+
+Chat prompts carry only the last PROMPT_HISTORY_MAX_TURNS messages. Older
+messages are folded into a per-user summary (ConversationSummary) in the
+background once SUMMARY_EVERY_N_TURNS turns have scrolled out of that
+window, so prompt size stays flat as a conversation grows without losing
+its earlier context.
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import PROMPT_HISTORY_MAX_TURNS, SUMMARY_EVERY_N_TURNS, SUMMARY_MAX_CHARS
+from app.database import async_session
+from app.models.models import ChatMessage, ConversationSummary
+from app.services.emotion_service import summarize_conversation_async
+from app.services.session_pool import session_pool
+
+logger = logging.getLogger(__name__)
+
+_pending: dict[str, asyncio.Task] = {}
+_turns_since_check: dict[str, int] = {}
+_stats = {"updates": 0, "failures": 0, "messages_folded": 0}
+
+
+async def load_summary(db: AsyncSession, user_id: str) -> str | None:
+    row = await db.get(ConversationSummary, user_id)
+    return row.summary if row else None
+
+
+def schedule_summary_update(user_id: str) -> None:
+    """
+    Count a saved turn; every SUMMARY_EVERY_N_TURNS turns, check (in the
+    background) whether the user's summary is due and update it.
+    """
+    if SUMMARY_EVERY_N_TURNS <= 0:
+        return
+    turns = _turns_since_check.get(user_id, 0) + 1
+    if turns < SUMMARY_EVERY_N_TURNS or user_id in _pending:
+        _turns_since_check[user_id] = turns
+        return
+    _turns_since_check.pop(user_id, None)
+    task = asyncio.create_task(_update_summary(user_id))
+    _pending[user_id] = task
+    task.add_done_callback(lambda _: _pending.pop(user_id, None))
+
+
+async def _update_summary(user_id: str) -> None:
+    try:
+        async with async_session() as db:
+            row = await db.get(ConversationSummary, user_id)
+            unsummarized = select(ChatMessage).where(ChatMessage.user_id == user_id)
+            if row is not None:
+                unsummarized = unsummarized.where(ChatMessage.created_at > row.summarized_through)
+
+            # Fold only messages that have left the prompt's recent window,
+            # and only once a full batch of turns has built up
+            count = await db.scalar(select(func.count()).select_from(unsummarized.subquery()))
+            if count < PROMPT_HISTORY_MAX_TURNS + 2 * SUMMARY_EVERY_N_TURNS:
+                return
+
+            result = await db.execute(
+                unsummarized.order_by(ChatMessage.created_at).limit(count - PROMPT_HISTORY_MAX_TURNS)
+            )
+            messages = result.scalars().all()
+            summary = await summarize_conversation_async(
+                row.summary if row else None,
+                [{"content": m.content, "is_ai_response": m.is_ai_response} for m in messages],
+            )
+            if not summary:
+                return
+            summary = summary[:SUMMARY_MAX_CHARS]
+
+            if row is None:
+                row = ConversationSummary(user_id=user_id, messages_summarized=0)
+                db.add(row)
+            row.summary = summary
+            row.summarized_through = messages[-1].created_at
+            row.messages_summarized += len(messages)
+            await db.commit()
+
+        session_pool.set_summary(user_id, summary)
+        _stats["updates"] += 1
+        _stats["messages_folded"] += len(messages)
+    except Exception as e:
+        _stats["failures"] += 1
+        logger.error(f"Conversation summary update failed for {user_id}: {e}")
+
+
+async def drain_summary_updates(timeout: float = 10.0) -> None:
+    """Let in-flight summary updates finish; called on shutdown."""
+    if _pending:
+        await asyncio.wait(list(_pending.values()), timeout=timeout)
+
+
+def summary_stats() -> dict:
+    return {
+        "in_flight": len(_pending),
+        "every_n_turns": SUMMARY_EVERY_N_TURNS,
+        **_stats,
+    }
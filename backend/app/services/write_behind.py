@@ -0,0 +1,187 @@
+"""
+Write-behind buffer for chat emotion logs and mood updates.
+
+With WRITE_BEHIND_ENABLED, a chat turn no longer inserts its EmotionLog or
+rewrites users.current_mood inside the request. Both are queued here: log
+rows are batched, mood updates are coalesced per user (last one wins), and a
+background task writes everything in one transaction when WRITE_BEHIND_MAX_BATCH
+rows are waiting or every WRITE_BEHIND_FLUSH_INTERVAL_SECONDS. The app
+lifespan starts the task and flushes whatever is left on shutdown. The
+per-user emotion counts are bumped in the same flush transaction.
+
+Reads of emotion logs and current_mood can lag by up to one flush interval.
+A failed flush puts its rows back in the queue; beyond WRITE_BEHIND_MAX_QUEUE
+waiting log rows the oldest are dropped (and counted).
+"""
+
+import asyncio
+import logging
+import time
+
+from sqlalchemy import insert, update
+
+from app.config import (
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_MAX_BATCH,
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+    WRITE_BEHIND_MAX_QUEUE,
+)
+from app.database import async_session
+from app.models.models import EmotionLog, User
+from app.services.emotion_counts import increment_emotion_counts
+from app.services.emotion_vectors import emotion_vectors
+from app.utils.auth import invalidate_user
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(self, enabled: bool, max_batch: int, flush_interval: float, max_queue: int):
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._logs: list[dict] = []
+        self._moods: dict[str, str] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._stats = {
+            "flushes": 0,
+            "failures": 0,
+            "logs_written": 0,
+            "moods_written": 0,
+            "moods_coalesced": 0,
+            "dropped": 0,
+            "flush_ms_total": 0.0,
+            "flush_ms_max": 0.0,
+            "last_flush_ms": 0.0,
+        }
+
+    @property
+    def depth(self) -> int:
+        return len(self._logs) + len(self._moods)
+
+    def add_emotion_log(self, row: dict) -> None:
+        """Queue an EmotionLog insert (a dict of column values, id and created_at included)."""
+        self._logs.append(row)
+        if len(self._logs) > self.max_queue:
+            overflow = len(self._logs) - self.max_queue
+            del self._logs[:overflow]
+            self._stats["dropped"] += overflow
+        self._maybe_wake()
+
+    def set_mood(self, user_id: str, mood: str) -> None:
+        """Queue a current_mood update; replaces any still-pending one for the user."""
+        if user_id in self._moods:
+            self._stats["moods_coalesced"] += 1
+        self._moods[user_id] = mood
+        self._maybe_wake()
+
+    def discard_mood(self, user_id: str) -> None:
+        """Drop a pending mood update, e.g. after the mood was written directly."""
+        self._moods.pop(user_id, None)
+
+    def _maybe_wake(self) -> None:
+        if self.depth >= self.max_batch:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self.depth:
+            if not await self.flush():
+                logger.error(f"Write-behind: {self.depth} queued writes lost on shutdown")
+                break
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """Write one batch of queued rows in a single transaction. Returns False on failure."""
+        async with self._flush_lock:
+            if not self.depth:
+                return True
+            logs, self._logs = self._logs[:self.max_batch], self._logs[self.max_batch:]
+            moods, self._moods = self._moods, {}
+
+            started = time.perf_counter()
+            try:
+                async with async_session() as db:
+                    if logs:
+                        await db.execute(insert(EmotionLog), logs)
+                        await increment_emotion_counts(db, [(row["user_id"], row["emotion"]) for row in logs])
+                    if moods:
+                        await db.execute(
+                            update(User),
+                            [{"id": user_id, "current_mood": mood} for user_id, mood in moods.items()],
+                        )
+                    await db.commit()
+            except Exception as e:
+                # Put the batch back; newer mood updates queued meanwhile win
+                self._logs[:0] = logs
+                for user_id, mood in moods.items():
+                    self._moods.setdefault(user_id, mood)
+                self._stats["failures"] += 1
+                logger.error(f"Write-behind flush failed ({len(logs)} logs, {len(moods)} moods): {e}")
+                return False
+
+            for user_id in moods:
+                invalidate_user(user_id)
+            for row in logs:
+                emotion_vectors.record(row["id"], row["user_id"], row["emotion"], row["intensity"], row["created_at"])
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats = self._stats
+            stats["flushes"] += 1
+            stats["logs_written"] += len(logs)
+            stats["moods_written"] += len(moods)
+            stats["flush_ms_total"] += elapsed_ms
+            stats["flush_ms_max"] = max(stats["flush_ms_max"], elapsed_ms)
+            stats["last_flush_ms"] = elapsed_ms
+            # A backlog of more than one batch drains back-to-back, not one per interval
+            self._maybe_wake()
+            return True
+
+    def stats(self) -> dict:
+        stats = self._stats
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self.depth,
+            "queued_logs": len(self._logs),
+            "queued_moods": len(self._moods),
+            "max_batch": self.max_batch,
+            "flush_interval_seconds": self.flush_interval,
+            "flushes": stats["flushes"],
+            "failures": stats["failures"],
+            "logs_written": stats["logs_written"],
+            "moods_written": stats["moods_written"],
+            "moods_coalesced": stats["moods_coalesced"],
+            "dropped": stats["dropped"],
+            "avg_flush_ms": round(stats["flush_ms_total"] / stats["flushes"], 1) if stats["flushes"] else 0.0,
+            "max_flush_ms": round(stats["flush_ms_max"], 1),
+            "last_flush_ms": round(stats["last_flush_ms"], 1),
+        }
+
+
+write_behind = WriteBehindBuffer(
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_MAX_BATCH,
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+    WRITE_BEHIND_MAX_QUEUE,
+)
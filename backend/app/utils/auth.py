@@ -1,3 +1,8 @@
+import asyncio
+import hashlib
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -5,9 +10,21 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from sqlalchemy.orm import make_transient_to_detached
+from app.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    AUTH_CACHE_MAX_ENTRIES,
+    AUTH_TOKEN_CACHE_TTL_SECONDS,
+    AUTH_USER_CACHE_TTL_SECONDS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_QUEUE,
+)
 from app.database import get_db
 from app.models.models import User
+from app.services.presence import presence
+from app.utils.cache import TTLCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -21,6 +38,76 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# bcrypt costs ~100-300 ms of CPU per call. Request handlers run it on a
+# dedicated pool (bcrypt releases the GIL) so a login burst doesn't stall the
+# event loop; callers beyond PASSWORD_HASH_MAX_QUEUE waiting get a 503.
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+_password_stats = {
+    "calls": 0,
+    "rejected": 0,
+    "waiting": 0,
+    "running": 0,
+    "max_waiting": 0,
+    "wait_ms_total": 0.0,
+    "run_ms_total": 0.0,
+}
+
+
+async def _run_password_work(func, *args):
+    stats = _password_stats
+    if stats["waiting"] >= PASSWORD_HASH_MAX_QUEUE:
+        stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts right now, please try again",
+            headers={"Retry-After": "1"},
+        )
+
+    queued_at = time.perf_counter()
+    stats["waiting"] += 1
+    stats["max_waiting"] = max(stats["max_waiting"], stats["waiting"])
+    try:
+        await _password_slots.acquire()
+    finally:
+        stats["waiting"] -= 1
+
+    started_at = time.perf_counter()
+    stats["running"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        stats["running"] -= 1
+        _password_slots.release()
+        stats["calls"] += 1
+        stats["wait_ms_total"] += (started_at - queued_at) * 1000
+        stats["run_ms_total"] += (time.perf_counter() - started_at) * 1000
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password_work(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_work(verify_password, plain_password, hashed_password)
+
+
+def password_hashing_stats() -> dict:
+    stats = _password_stats
+    calls = stats["calls"]
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        "queue_depth": stats["waiting"],
+        "running": stats["running"],
+        "max_queue_depth": stats["max_waiting"],
+        "calls": calls,
+        "rejected": stats["rejected"],
+        "avg_wait_ms": round(stats["wait_ms_total"] / calls, 1) if calls else 0.0,
+        "avg_run_ms": round(stats["run_ms_total"] / calls, 1) if calls else 0.0,
+    }
+
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -28,25 +115,98 @@ def create_access_token(data: dict) -> str:
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db),
-) -> User:
-    credentials_exception = HTTPException(
+# Verified tokens (keyed by SHA-256 of the token) and user rows (keyed by id),
+# so most authenticated requests skip both the JWT decode and the users query.
+# Call invalidate_user after changing a user row.
+_token_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES, AUTH_TOKEN_CACHE_TTL_SECONDS)
+_user_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES, AUTH_USER_CACHE_TTL_SECONDS)
+# Bumped by invalidate_user, so a load that read the row before an
+# invalidation doesn't cache its stale copy afterwards. Values come from one
+# counter, so an expired entry never reappears with the value a load saw.
+_user_generations = TTLCache(AUTH_CACHE_MAX_ENTRIES, AUTH_USER_CACHE_TTL_SECONDS)
+_generation_counter = itertools.count(1)
+_USER_COLUMNS = [column.key for column in User.__table__.columns]
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _user_id_from_token(token: str) -> str:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    user_id = _token_cache.get(key)
+    if user_id is not None:
+        return user_id
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    # Never cache a token past its own expiry
+    ttl = AUTH_TOKEN_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        _token_cache.set(key, user_id, ttl)
+    return user_id
+
+
+def user_id_for_token(token: str | None) -> str | None:
+    """Verified user id for a raw token (e.g. a WebSocket query parameter), or None if invalid."""
+    if not token:
+        return None
+    try:
+        return _user_id_from_token(token)
+    except HTTPException:
+        return None
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop the cached copy of a user row after it changes."""
+    _user_generations.set(user_id, next(_generation_counter))
+    _user_cache.pop(user_id)
+
+
+def auth_cache_stats() -> dict:
+    return {"tokens": _token_cache.stats(), "users": _user_cache.stats()}
+
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
+    """Claims-only dependency: the verified user id, without loading the user."""
+    user_id = _user_id_from_token(token)
+    presence.heartbeat(user_id)
+    return user_id
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    user_id = _user_id_from_token(token)
+    presence.heartbeat(user_id)
+
+    snapshot = _user_cache.get(user_id)
+    if snapshot is not None:
+        # Attach a copy to this request's session as if it had just been
+        # loaded, so handlers can still modify and commit it
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        db.add(user)
+        return user
 
+    generation = _user_generations.get(user_id)
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    if _user_generations.get(user_id) == generation:
+        _user_cache.set(user_id, {key: getattr(user, key) for key in _USER_COLUMNS})
     return user
@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination over (created_at, id).
+
+Pages are fetched with a row-value comparison against the last row seen
+instead of OFFSET, so every page is one index range scan no matter how deep
+it is, and rows inserted meanwhile don't shift later pages. Cursors are
+opaque to clients: URL-safe base64 of the row's timestamp and id.
+
+Results come back oldest first, matching the existing list endpoints. The
+response carries X-Before-Cursor (pass as `before` for older rows; absent
+when there are none) and X-After-Cursor (pass as `after` for rows newer than
+this page, e.g. when polling).
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+BEFORE_HEADER = "X-Before-Cursor"
+AFTER_HEADER = "X-After-Cursor"
+NEXT_HEADER = "X-Next-Cursor"  # ranked lists (discover), which only page forwards
+CURSOR_HEADERS = [BEFORE_HEADER, AFTER_HEADER, NEXT_HEADER]
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query: Select,
+    model,
+    response: Response,
+    limit: int,
+    before: str | None = None,
+    after: str | None = None,
+) -> list:
+    """
+    Run `query` (a select of `model` with its filters applied) for one page
+    and set the cursor headers on `response`. Without a cursor the newest
+    page is returned.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    key = tuple_(model.created_at, model.id)
+    if after:
+        query = query.where(key > tuple_(*decode_cursor(after))).order_by(model.created_at, model.id)
+    else:
+        if before:
+            query = query.where(key < tuple_(*decode_cursor(before)))
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+
+    # One extra row tells us whether another page exists
+    rows = list((await db.execute(query.limit(limit + 1))).scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+
+    # Older rows exist past the oldest one here when we paged backwards and
+    # hit the limit, or always when paging forwards from a cursor
+    if rows and (after or has_more):
+        response.headers[BEFORE_HEADER] = encode_cursor(rows[0].created_at, rows[0].id)
+    if rows:
+        response.headers[AFTER_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    elif after:
+        response.headers[AFTER_HEADER] = after
+    return rows
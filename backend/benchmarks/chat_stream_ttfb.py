@@ -0,0 +1,86 @@
+"""
+Time-to-first-byte of /api/chat/send vs the /api/chat/stream SSE endpoint.
+
+Starts the app on a local port against a throwaway SQLite database and the
+local fake model (LLM_BACKEND=fake), so no network access or API key is
+needed. Chunk timing is controlled with --first-chunk-ms / --chunk-ms.
+
+Run from the backend directory:
+    python -m benchmarks.chat_stream_ttfb [--requests 10]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def configure_env(args: argparse.Namespace, db_path: str) -> None:
+    # Must happen before any app module is imported
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_FIRST_CHUNK_DELAY_MS"] = str(args.first_chunk_ms)
+    os.environ["FAKE_LLM_CHUNK_DELAY_MS"] = str(args.chunk_ms)
+    os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+
+
+async def timed_request(client, path: str, headers: dict, message: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", path, json={"message": message}, headers=headers) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            if first is None:
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace) -> None:
+    import httpx
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+            credentials = {"username": "benchuser", "email": "bench@example.com", "password": "benchpass"}
+            response = await client.post("/api/auth/register", json=credentials)
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            print(f"fake model: first chunk {args.first_chunk_ms} ms, then {args.chunk_ms} ms/chunk")
+            for path in ("/api/chat/send", "/api/chat/stream"):
+                firsts, totals = [], []
+                for i in range(args.requests):
+                    first, total = await timed_request(client, path, headers, f"I'm feeling sad today ({i})")
+                    firsts.append(first)
+                    totals.append(total)
+                print(
+                    f"{path:<18} ttfb median {statistics.median(firsts) * 1000:7.1f} ms   "
+                    f"complete median {statistics.median(totals) * 1000:7.1f} ms"
+                )
+    finally:
+        server.should_exit = True
+        await serve_task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--first-chunk-ms", type=int, default=300)
+    parser.add_argument("--chunk-ms", type=int, default=40)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(args, os.path.join(tmp, "bench.db"))
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Equivalence check and microbenchmark for the rule-based emotion engine.
+
+data/emotion_corpus.json holds ~1,100 messages (hand-written edge cases plus
+seeded random mixes of keywords, negations, phrases and emoji) together with
+the EmotionResult recorded from the original per-pattern re.search
+implementation. Any rule change that alters detection output shows up here.
+
+Run from the backend directory:
+    python -m benchmarks.emotion_engine [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from app.services.emotion_service import (
+    _check_crisis,
+    _detect_emoji_emotion,
+    _detect_keyword_emotion,
+    _detect_phrase_emotion,
+    detect_emotion_rule_based,
+)
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "emotion_corpus.json")
+
+
+def load_corpus() -> list[dict]:
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_equivalence(cases: list[dict]) -> int:
+    """Compare detector output against the recorded results; return the mismatch count."""
+    mismatches = 0
+    for case in cases:
+        result = detect_emotion_rule_based(case["text"])
+        actual = {
+            "emotion": result.emotion,
+            "confidence": result.confidence,
+            "sentiment_score": result.sentiment_score,
+            "is_crisis": result.is_crisis,
+            "context_tags": sorted(result.context_tags),
+        }
+        expected = {key: case[key] for key in actual}
+        if actual != expected:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"MISMATCH {case['text']!r}\n  expected {expected}\n  actual   {actual}")
+    return mismatches
+
+
+def bench(label: str, func, texts: list[str], repeat: int) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    per_msg = best / len(texts) * 1e6
+    print(f"{label:<28} {per_msg:8.1f} us/msg {len(texts) / best:12,.0f} msg/s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per layer (best is reported)")
+    args = parser.parse_args()
+
+    cases = load_corpus()
+    mismatches = check_equivalence(cases)
+    print(f"equivalence: {len(cases) - mismatches}/{len(cases)} messages match")
+
+    texts = [case["text"] for case in cases]
+    bench("detect_emotion_rule_based", detect_emotion_rule_based, texts, args.repeat)
+    bench("  crisis", _check_crisis, texts, args.repeat)
+    bench("  phrases", _detect_phrase_emotion, texts, args.repeat)
+    bench("  emoji", _detect_emoji_emotion, texts, args.repeat)
+    bench("  keywords + negation", _detect_keyword_emotion, texts, args.repeat)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
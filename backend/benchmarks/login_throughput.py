@@ -0,0 +1,126 @@
+"""
+Login throughput, and latency of other endpoints while logins are running.
+
+Starts the app on a local port against a throwaway SQLite database, registers
+--users accounts, then runs --concurrency login loops for --seconds while a
+probe loop hits GET /api/health. With --inline, bcrypt runs directly on the
+event loop (the old behaviour) for comparison.
+
+Run from the backend directory:
+    python -m benchmarks.login_throughput [--concurrency 16] [--seconds 10]
+    python -m benchmarks.login_throughput --inline
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def configure_env(db_path: str) -> None:
+    # Must happen before any app module is imported
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["LLM_BACKEND"] = "fake"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(args: argparse.Namespace) -> None:
+    import httpx
+    import uvicorn
+    from app.main import app
+    from app.routes import auth as auth_routes
+    from app.utils import auth
+
+    if args.inline:
+        async def inline_hash(password):
+            return auth.hash_password(password)
+
+        async def inline_verify(plain, hashed):
+            return auth.verify_password(plain, hashed)
+
+        auth_routes.hash_password_async = inline_hash
+        auth_routes.verify_password_async = inline_verify
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency + 4)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120, limits=limits) as client:
+            accounts = []
+            for i in range(args.users):
+                credentials = {"username": f"bench{i}", "email": f"bench{i}@example.com", "password": "benchpass"}
+                response = await client.post("/api/auth/register", json=credentials)
+                response.raise_for_status()
+                accounts.append(credentials)
+
+            stop_at = time.perf_counter() + args.seconds
+            login_times: list[float] = []
+            probe_times: list[float] = []
+
+            async def login_loop(worker: int) -> None:
+                i = worker
+                while time.perf_counter() < stop_at:
+                    account = accounts[i % len(accounts)]
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/api/auth/login",
+                        json={"email": account["email"], "password": account["password"]},
+                    )
+                    if response.status_code == 200:
+                        login_times.append(time.perf_counter() - start)
+                    i += args.concurrency
+
+            async def probe_loop() -> None:
+                while time.perf_counter() < stop_at:
+                    start = time.perf_counter()
+                    (await client.get("/api/health")).raise_for_status()
+                    probe_times.append(time.perf_counter() - start)
+                    await asyncio.sleep(0.02)
+
+            await asyncio.gather(probe_loop(), *(login_loop(w) for w in range(args.concurrency)))
+
+            mode = "inline (event loop)" if args.inline else f"pool ({auth.PASSWORD_HASH_WORKERS} workers)"
+            print(f"bcrypt {mode}, {args.concurrency} concurrent logins for {args.seconds}s")
+            print(
+                f"logins      {len(login_times) / args.seconds:7.1f}/s   "
+                f"p50 {statistics.median(login_times) * 1000:8.1f} ms   "
+                f"p99 {percentile(login_times, 0.99) * 1000:8.1f} ms"
+            )
+            print(
+                f"/api/health {len(probe_times):7d} req  "
+                f"p50 {statistics.median(probe_times) * 1000:8.1f} ms   "
+                f"p99 {percentile(probe_times, 0.99) * 1000:8.1f} ms   "
+                f"max {max(probe_times) * 1000:8.1f} ms"
+            )
+            if not args.inline:
+                print(f"pool stats  {auth.password_hashing_stats()}")
+    finally:
+        server.should_exit = True
+        await serve_task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop (old behaviour)")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(os.path.join(tmp, "bench.db"))
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
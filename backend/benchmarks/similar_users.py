@@ -0,0 +1,138 @@
+"""
+Build time, query latency and update cost of the emotion vectors behind
+/api/connect/similar, at several user counts.
+
+Feeds synthetic emotion logs (--logs-per-user per user, spread over the last
+--days days) straight into an EmotionVectors instance, so no database is
+involved. For the first size it also checks the ranking against a float64
+reference that applies the time decay directly (weight * 0.5 ** (age / half_life)),
+and that a heavy user whose row squares past float32 range still scores.
+
+Run from the backend directory:
+    python -m benchmarks.similar_users [--users 1000,10000,100000,300000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+# Must happen before any app module is imported
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import numpy as np
+
+from app.services.emotion_vectors import EMOTIONS, EmotionVectors
+
+_CHUNK = 50_000
+
+
+def synthetic_logs(users: int, logs_per_user: int, days: int, seed: int):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    logs = []
+    for u in range(users):
+        # Each user leans towards a few emotions
+        favourites = rng.sample(EMOTIONS, 3)
+        for _ in range(logs_per_user):
+            emotion = rng.choice(favourites) if rng.random() < 0.7 else rng.choice(EMOTIONS)
+            intensity = None if rng.random() < 0.05 else round(rng.random(), 2)
+            created_at = now - timedelta(seconds=rng.random() * days * 86400)
+            logs.append((f"log-{len(logs)}", f"user-{u}", emotion, intensity, created_at))
+    rng.shuffle(logs)
+    return logs, now
+
+
+def build(vectors: EmotionVectors, logs) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(logs), _CHUNK):
+        vectors._apply(logs[i:i + _CHUNK])
+    return time.perf_counter() - start
+
+
+def reference_top(logs, now: datetime, half_life_days: float, user_id: str, limit: int) -> list[str]:
+    column = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+    rows: dict[str, np.ndarray] = {}
+    for _, uid, emotion, intensity, created_at in logs:
+        age_days = (now - created_at).total_seconds() / 86400
+        weight = (0.5 if intensity is None else intensity) * 0.5 ** (age_days / half_life_days)
+        rows.setdefault(uid, np.zeros(len(EMOTIONS)))[column[emotion]] += weight
+    ids = [uid for uid in rows if uid != user_id]
+    matrix = np.array([rows[uid] for uid in ids])
+    query = rows[user_id]
+    scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-scores)[:limit]]
+
+
+def check_overflow(half_life_days: float) -> bool:
+    """
+    A user with 100k full-intensity logs just below the rebase bound
+    has components past 2**64, whose squares overflow float32. Their norm
+    must stay finite, and a user with the same mix must still score ~1.
+    """
+    vectors = EmotionVectors(half_life_days)
+    vectors._epoch = datetime.utcnow()
+    near_bound = vectors._epoch + timedelta(days=half_life_days * 49.9)
+    for i in range(100_000):
+        vectors.record(f"heavy-{i}", "heavy", EMOTIONS[i % 2], 1.0, near_bound)
+    vectors.record("light-0", "light", EMOTIONS[0], 1.0, near_bound)
+    vectors.record("light-1", "light", EMOTIONS[1], 1.0, near_bound)
+    scores = dict(vectors.similar_users("light", set(), 5))
+    return bool(np.isfinite(vectors._norms[vectors._row["heavy"]])) and abs(scores.get("heavy", 0) - 1) < 1e-4
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="1000,10000,100000,300000", help="comma-separated user counts")
+    parser.add_argument("--logs-per-user", type=int, default=20)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--half-life-days", type=float, default=30)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{len(EMOTIONS)} emotions, {args.logs_per_user} logs/user over {args.days} days")
+    print(f"{'users':>8} {'build':>9} {'matrix':>9} {'query p50':>10} {'query p95':>10} {'update':>9}")
+    for n, users in enumerate(int(u) for u in args.users.split(",")):
+        logs, now = synthetic_logs(users, args.logs_per_user, args.days, seed=users)
+        vectors = EmotionVectors(args.half_life_days)
+        build_seconds = build(vectors, logs)
+
+        rng = random.Random(0)
+        times = []
+        for _ in range(args.queries):
+            user_id = f"user-{rng.randrange(users)}"
+            start = time.perf_counter()
+            vectors.similar_users(user_id, set(), args.limit)
+            times.append(time.perf_counter() - start)
+        times.sort()
+
+        updates = 2000
+        start = time.perf_counter()
+        for i in range(updates):
+            vectors.record(f"new-{i}", f"user-{rng.randrange(users)}", rng.choice(EMOTIONS), 0.7, datetime.utcnow())
+        update_us = (time.perf_counter() - start) / updates * 1e6
+
+        print(
+            f"{users:>8,} {build_seconds:>8.2f}s {vectors.stats()['matrix_bytes'] / 2**20:>7.1f}MB "
+            f"{statistics.median(times) * 1000:>8.2f}ms {times[int(len(times) * 0.95)] * 1000:>8.2f}ms "
+            f"{update_us:>7.1f}us"
+        )
+
+        if n == 0:
+            check = EmotionVectors(args.half_life_days)
+            build(check, logs)
+            agree = 0
+            samples = 20
+            for i in range(samples):
+                user_id = f"user-{i}"
+                ours = [uid for uid, _ in check.similar_users(user_id, set(), args.limit)]
+                agree += ours == reference_top(logs, now, args.half_life_days, user_id, args.limit)
+            print(f"{'':>8} ranking matches the direct-decay reference for {agree}/{samples} users")
+            print(f"{'':>8} heavy user past float32 squared range: {'ok' if check_overflow(args.half_life_days) else 'FAILED'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Cold-start timing for the API process.
+
+Each run starts a fresh interpreter (as a worker respawn would), imports
+app.main, then runs the lifespan startup against a throwaway SQLite
+database. Pass --importtime to list the slowest imports of app.main.
+
+Run from the backend directory:
+    python -m benchmarks.startup_time [--runs 5] [--importtime]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def startup():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({"import": imported - start, "ready": ready - start}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def show_importtime(env: dict, top: int) -> None:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], env=env, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    print(f"\nslowest imports (cumulative):")
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="also print the slowest imports")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'startup.db')}")
+        results = [run_once(env) for _ in range(args.runs)]
+        imports = [r["import"] * 1000 for r in results]
+        ready = [r["ready"] * 1000 for r in results]
+        print(f"runs: {args.runs}")
+        print(f"import app.main   median {statistics.median(imports):7.1f} ms   min {min(imports):7.1f} ms")
+        print(f"ready to serve    median {statistics.median(ready):7.1f} ms   min {min(ready):7.1f} ms")
+        if args.importtime:
+            show_importtime(env, args.top)
+
+
+if __name__ == "__main__":
+    main()
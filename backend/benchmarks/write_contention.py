@@ -0,0 +1,166 @@
+"""
+Concurrent chat-turn writes under different database configurations.
+
+Each writer repeatedly does what /api/chat/send does against the database:
+read the user's recent history, insert two ChatMessage rows and an
+EmotionLog, update the user's mood, commit. Writers run as --tasks
+coroutines in each of --processes processes, all on one fresh database.
+
+Modes:
+    baseline  SQLite as the engine used to be configured (rollback journal,
+              synchronous=FULL, default cache, no mmap)
+    tuned     SQLite with the current defaults (WAL, synchronous=NORMAL, ...)
+    postgres  the URL given with --postgres-url (needs asyncpg); its tables
+              are created if missing and the benchmark rows are left behind
+
+Run from the backend directory:
+    python -m benchmarks.write_contention [--processes 4] [--tasks 4] [--turns 50]
+    python -m benchmarks.write_contention --modes tuned,postgres --postgres-url postgresql://...
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+BASELINE_SQLITE = {
+    "SQLITE_JOURNAL_MODE": "DELETE",
+    "SQLITE_SYNCHRONOUS": "FULL",
+    "SQLITE_CACHE_SIZE_KB": "2000",
+    "SQLITE_MMAP_SIZE": "0",
+}
+
+
+def mode_env(mode: str, args: argparse.Namespace, tmp: str) -> dict:
+    if mode == "postgres":
+        if not args.postgres_url:
+            raise SystemExit("--postgres-url is required for the postgres mode")
+        return {"DATABASE_URL": args.postgres_url}
+    env = {"DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(tmp, mode + '.db')}"}
+    if mode == "baseline":
+        env.update(BASELINE_SQLITE)
+    return env
+
+
+def _apply_env(env: dict) -> None:
+    # Must happen before any app module is imported (in a fresh process)
+    os.environ.update(env)
+    os.environ["LLM_BACKEND"] = "fake"
+
+
+def setup(env: dict, users: int) -> list[str]:
+    _apply_env(env)
+
+    async def run() -> list[str]:
+        from app.database import async_session, init_db
+        from app.models.models import User
+
+        await init_db()
+        stamp = int(time.time() * 1000)
+        async with async_session() as db:
+            rows = [
+                User(username=f"w{stamp}_{i}", email=f"w{stamp}_{i}@example.com", password_hash="x")
+                for i in range(users)
+            ]
+            db.add_all(rows)
+            await db.commit()
+            return [row.id for row in rows]
+
+    return asyncio.run(run())
+
+
+def writer_process(env: dict, user_ids: list[str], tasks: int, turns: int) -> tuple[list[float], int, list[str]]:
+    _apply_env(env)
+
+    async def run() -> tuple[list[float], int, list[str]]:
+        from sqlalchemy import desc, select, update
+
+        from app.database import async_session, engine
+        from app.models.models import ChatMessage, EmotionLog, User
+
+        latencies: list[float] = []
+        errors: list[str] = []
+        done = 0
+
+        async def one_turn(user_id: str, i: int) -> None:
+            async with async_session() as db:
+                await db.execute(
+                    select(ChatMessage)
+                    .where(ChatMessage.user_id == user_id)
+                    .order_by(desc(ChatMessage.created_at))
+                    .limit(10)
+                )
+                db.add(ChatMessage(user_id=user_id, content=f"message {i}", is_ai_response=False, emotion_detected="sad"))
+                db.add(ChatMessage(user_id=user_id, content=f"reply {i}", is_ai_response=True, emotion_detected="sad"))
+                db.add(EmotionLog(user_id=user_id, emotion="sad", intensity=0.5, note=f"message {i}"))
+                await db.execute(update(User).where(User.id == user_id).values(current_mood="sad"))
+                await db.commit()
+
+        async def task(n: int) -> None:
+            nonlocal done
+            user_id = user_ids[n % len(user_ids)]
+            for i in range(turns):
+                start = time.perf_counter()
+                try:
+                    await one_turn(user_id, i)
+                except Exception as e:
+                    errors.append(type(e).__name__ + ": " + str(e).splitlines()[0][:80])
+                else:
+                    latencies.append(time.perf_counter() - start)
+                    done += 1
+
+        await asyncio.gather(*(task(n) for n in range(tasks)))
+        await engine.dispose()
+        return latencies, done, errors
+
+    return asyncio.run(run())
+
+
+def run_mode(mode: str, args: argparse.Namespace, tmp: str) -> None:
+    ctx = multiprocessing.get_context("spawn")
+    env = mode_env(mode, args, tmp)
+    with ctx.Pool(1) as pool:
+        user_ids = pool.apply(setup, (env, args.processes * args.tasks))
+
+    started = time.perf_counter()
+    with ctx.Pool(args.processes) as pool:
+        results = pool.starmap(
+            writer_process,
+            [(env, user_ids[p * args.tasks:(p + 1) * args.tasks], args.tasks, args.turns) for p in range(args.processes)],
+        )
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for result in results for l in result[0])
+    done = sum(result[1] for result in results)
+    errors = [e for result in results for e in result[2]]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+    print(
+        f"{mode:<9} {done / elapsed:8.1f} turns/s   "
+        f"p50 {statistics.median(latencies) * 1000 if latencies else 0.0:8.1f} ms   "
+        f"p99 {p99 * 1000:8.1f} ms   errors {len(errors)}"
+    )
+    for message in sorted(set(errors))[:3]:
+        print(f"          {message}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="baseline,tuned", help="comma-separated: baseline, tuned, postgres")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=4, help="concurrent writers per process")
+    parser.add_argument("--turns", type=int, default=50, help="chat turns per writer")
+    parser.add_argument("--postgres-url")
+    parser.add_argument("--dir", default=".", help="where to create the SQLite files (use a real disk, not tmpfs)")
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes x {args.tasks} writers x {args.turns} turns")
+    with tempfile.TemporaryDirectory(dir=args.dir, prefix="write_contention_") as tmp:
+        for mode in args.modes.split(","):
+            run_mode(mode.strip(), args, tmp)
+
+
+if __name__ == "__main__":
+    main()
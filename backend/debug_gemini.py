@@ -1,7 +1,7 @@
 import os
 import asyncio
 import logging
-from app.services.emotion_service import generate_response_with_gemini, model
+from app.services.emotion_service import generate_response_with_gemini, get_model
 from dotenv import load_dotenv
 
 # Configure logging to print to console
@@ -10,7 +10,7 @@ logging.basicConfig(level=logging.DEBUG)
 load_dotenv()
 
 print(f"API Key present: {bool(os.getenv('GEMINI_API_KEY'))}")
-print(f"Model initialized: {model is not None}")
+print(f"Model initialized: {get_model() is not None}")
 
 def test():
     print("Testing Gemini generation with configured model...")
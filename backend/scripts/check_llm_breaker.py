@@ -0,0 +1,82 @@
+"""
+Check that a Gemini call cancelled while it waits for a model slot still
+reports back to the circuit breaker.
+
+For both the one-shot and the streaming path: trip the breaker, let it go
+half-open, hold every model slot, start a call (it becomes the half-open
+probe) and cancel it while it waits, as a client disconnect would. The probe
+must be recorded as failed, leaving no probe in flight, so the breaker
+admits another probe once it reopens instead of rejecting calls for good.
+
+Needs no database or API key. Exits 1 if either path leaks the probe.
+
+Run from the backend directory:
+    python -m scripts.check_llm_breaker
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Must happen before any app module is imported
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+
+async def cancel_probe(start_call) -> tuple[int, bool]:
+    """(probes in flight, whether a later probe is admitted) after cancelling a waiting probe."""
+    from app.config import LLM_MAX_CONCURRENCY
+    from app.services import emotion_service as es
+    from app.services.circuit_breaker import CircuitBreaker
+
+    # A fresh breaker per case, so one leaked probe can't decide the next case
+    breaker = es._gemini_breaker = CircuitBreaker("gemini-check")
+    with breaker._lock:
+        breaker._trip(time.monotonic() - breaker.open_seconds)
+
+    for _ in range(LLM_MAX_CONCURRENCY):
+        await es._llm_slots.acquire()
+    try:
+        task = asyncio.create_task(start_call(es.build_prompt("hello", [], es.SYSTEM_PROMPT)))
+        await asyncio.sleep(0.05)  # now waiting for a slot
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    finally:
+        for _ in range(LLM_MAX_CONCURRENCY):
+            es._llm_slots.release()
+
+    in_flight = breaker._probes_in_flight
+    with breaker._lock:
+        breaker._opened_at = time.monotonic() - breaker.open_seconds
+    call = breaker.try_call()
+    if call is not None:
+        call.finish(True)
+    return in_flight, call is not None
+
+
+async def check() -> bool:
+    from app.services import emotion_service as es
+
+    async def stream(prompt):
+        async for _ in es._stream_gemini_bounded(prompt):
+            pass
+
+    ok = True
+    for label, start_call in (("_run_gemini_bounded", es._run_gemini_bounded), ("_stream_gemini_bounded", stream)):
+        in_flight, admitted = await cancel_probe(start_call)
+        passed = in_flight == 0 and admitted
+        ok &= passed
+        print(f"  {label}: probes in flight {in_flight}, next probe admitted {admitted}: {'ok' if passed else 'LEAKED'}")
+    return ok
+
+
+def main() -> None:
+    ok = asyncio.run(check())
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Check that the hot API endpoints are served by indexes, not table scans.
+
+Builds a throwaway SQLite database the way an existing deployment looks
+before migrations (current tables, none of the migration-managed indexes),
+starts the app so init_db applies pending migrations, then drives the hot
+endpoints through the real routes. Every SELECT/UPDATE/DELETE they issue is
+captured and run through EXPLAIN QUERY PLAN; a full scan of a hot table is
+reported as a failure (exit status 1).
+
+Run from the backend directory:
+    python -m scripts.check_query_plans [--verbose]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+HOT_TABLES = {"users", "chat_messages", "emotion_logs", "direct_messages", "user_connections", "user_interests"}
+_SCAN_RE = re.compile(r"\bSCAN (\w+)(?: AS \w+)?(?! USING (?:COVERING )?INDEX)")
+
+
+def configure_env(db_path: str) -> None:
+    # Must happen before any app module is imported
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_FIRST_CHUNK_DELAY_MS"] = "0"
+    os.environ["FAKE_LLM_CHUNK_DELAY_MS"] = "0"
+
+
+def create_pre_migration_schema(db_path: str) -> None:
+    from sqlalchemy import create_engine
+
+    from app.database import Base
+    from app.models import models  # noqa: F401  (registers every table)
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                # The baseline schema only had the unique username/email indexes
+                if not index.unique:
+                    index.drop(conn)
+    engine.dispose()
+
+
+async def exercise_endpoints(capture: "StatementCapture") -> None:
+    import httpx
+
+    from app.main import app
+    from app.services.emotion_vectors import emotion_vectors
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+            users = []
+            for name in ("planner", "checker"):
+                credentials = {"username": name, "email": f"{name}@example.com", "password": "checkpass"}
+                response = await client.post("/api/auth/register", json=credentials)
+                response.raise_for_status()
+                body = response.json()
+                users.append(({"Authorization": f"Bearer {body['access_token']}"}, body["user"]["id"]))
+            (me, my_id), (other, other_id) = users
+
+            async def call(label: str, method: str, path: str, headers: dict, **kwargs) -> httpx.Response:
+                capture.start(label)
+                response = await client.request(method, path, headers=headers, **kwargs)
+                response.raise_for_status()
+                return response
+
+            await call("POST /api/chat/send", "POST", "/api/chat/send", me, json={"message": "feeling kind of sad"})
+            page = await call("GET /api/chat/history", "GET", "/api/chat/history", me, params={"limit": 1})
+            await call("GET /api/chat/history?before=", "GET", "/api/chat/history", me,
+                       params={"before": page.headers["X-Before-Cursor"]})
+            await call("GET /api/chat/history?after=", "GET", "/api/chat/history", me,
+                       params={"after": page.headers["X-Before-Cursor"]})
+            await call("GET /api/profile/emotions", "GET", "/api/profile/emotions", me)
+            await call("GET /api/profile/emotions/summary", "GET", "/api/profile/emotions/summary", me)
+            await call("GET /api/profile/emotions/timeline", "GET", "/api/profile/emotions/timeline", me,
+                       params={"bucket": "day"})
+            await call("PUT /api/profile/me (interests)", "PUT", "/api/profile/me", me, json={"interests": ["music"]})
+            await call("GET /api/profile/me", "GET", "/api/profile/me", me)
+            await call("GET /api/connect/discover", "GET", "/api/connect/discover", other)
+            await call("GET /api/connect/discover?mood=", "GET", "/api/connect/discover", other, params={"mood": "sad"})
+            while not emotion_vectors.ready:
+                await asyncio.sleep(0.01)
+            await call("GET /api/connect/similar", "GET", "/api/connect/similar", me)
+            await call("POST /api/connect/request", "POST", "/api/connect/request", other, json={"target_user_id": my_id})
+            await call("GET /api/connect/pending", "GET", "/api/connect/pending", me)
+            await call("GET /api/connect/my-connections", "GET", "/api/connect/my-connections", me)
+            await call("POST /api/connect/messages", "POST", "/api/connect/messages", me,
+                       json={"receiver_id": other_id, "content": "hey"})
+            page = await call("GET /api/connect/messages/{id}", "GET", f"/api/connect/messages/{my_id}", other)
+            await call("GET /api/connect/messages/{id}?before=", "GET", f"/api/connect/messages/{my_id}", other,
+                       params={"before": page.headers["X-After-Cursor"]})
+            await call("GET /api/connect/inbox", "GET", "/api/connect/inbox", other)
+            await call("PUT /api/connect/messages/{id}/read", "PUT", f"/api/connect/messages/{my_id}/read", other)
+            await call("DELETE /api/connect/messages/{id}", "DELETE", f"/api/connect/messages/{my_id}", other)
+            capture.start(None)
+
+
+class StatementCapture:
+    def __init__(self):
+        self.label: str | None = None
+        self.statements: list[tuple[str, str, tuple]] = []
+
+    def start(self, label: str | None) -> None:
+        self.label = label
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if self.label and not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            self.statements.append((self.label, statement, tuple(parameters or ())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not just failures")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "plans.db")
+        configure_env(db_path)
+        create_pre_migration_schema(db_path)
+
+        from sqlalchemy import event
+
+        from app.database import engine
+
+        capture = StatementCapture()
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        asyncio.run(exercise_endpoints(capture))
+
+        failures = 0
+        with sqlite3.connect(db_path) as conn:
+            version = conn.execute("SELECT max(version) FROM schema_migrations").fetchone()[0]
+            print(f"schema version after startup: {version}")
+            for label, statement, parameters in capture.statements:
+                plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                scans = [m.group(1) for line in plan for m in _SCAN_RE.finditer(line) if m.group(1) in HOT_TABLES]
+                if scans:
+                    failures += 1
+                if scans or args.verbose:
+                    status = f"FULL SCAN of {', '.join(scans)}" if scans else "ok"
+                    print(f"\n{label}: {status}\n  {' '.join(statement.split())}")
+                    for line in plan:
+                        print(f"    {line}")
+
+        endpoints = len({label for label, _, _ in capture.statements})
+        print(f"\n{len(capture.statements)} statements from {endpoints} endpoints, {failures} with full table scans")
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Check the exact SQL statements POST /api/chat/send issues for a warm user.
+
+Once the user's identity and chat context are cached (after their first
+request), a chat turn should cost one transaction with four statements: the users
+UPDATE for current_mood, the batched INSERT of both chat messages, the
+emotion log INSERT and the emotion count upsert. No read-backs for ids or
+timestamps.
+
+With --write-behind, the emotion log, its count and the mood update are
+queued for the background flush instead, leaving only the chat message INSERT.
+
+Runs the real route against a throwaway SQLite database with the local fake
+model and rolling summaries off (they run in the background, outside the
+request). Exits 1 if the statements differ.
+
+Run from the backend directory:
+    python -m scripts.check_send_statements [--write-behind]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+EXPECTED = [
+    ("INSERT INTO chat_messages", True),
+    ("INSERT INTO emotion_logs", False),
+    ("UPDATE users", False),
+    ("INSERT INTO user_emotion_counts", False),
+]
+EXPECTED_WRITE_BEHIND = [
+    ("INSERT INTO chat_messages", True),
+]
+
+
+def configure_env(db_path: str, write_behind: bool) -> None:
+    # Must happen before any app module is imported
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_FIRST_CHUNK_DELAY_MS"] = "0"
+    os.environ["FAKE_LLM_CHUNK_DELAY_MS"] = "0"
+    os.environ["SUMMARY_EVERY_N_TURNS"] = "0"
+    os.environ["WRITE_BEHIND_ENABLED"] = "true" if write_behind else "false"
+
+
+async def capture_send() -> list[tuple[str, bool]]:
+    import httpx
+    from sqlalchemy import event
+
+    from app.database import engine
+    from app.main import app
+
+    statements: list[tuple[str, bool]] = []
+    capturing = False
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if capturing:
+            statements.append((" ".join(statement.split()), executemany))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+            credentials = {"username": "sender", "email": "sender@example.com", "password": "checkpass"}
+            response = await client.post("/api/auth/register", json=credentials)
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            # Warm the identity cache and the chat session pool
+            (await client.get("/api/profile/me", headers=headers)).raise_for_status()
+            (await client.post("/api/chat/send", json={"message": "hey"}, headers=headers)).raise_for_status()
+            (await client.get("/api/profile/me", headers=headers)).raise_for_status()
+
+            capturing = True
+            response = await client.post("/api/chat/send", json={"message": "long day, kinda tired"}, headers=headers)
+            capturing = False
+            response.raise_for_status()
+            body = response.json()
+            assert body["user_message"]["id"] and body["ai_response"]["created_at"], body
+    return statements
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--write-behind", action="store_true", help="check with WRITE_BEHIND_ENABLED=true")
+    args = parser.parse_args()
+    expected = EXPECTED_WRITE_BEHIND if args.write_behind else EXPECTED
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(os.path.join(tmp, "send.db"), args.write_behind)
+        statements = asyncio.run(capture_send())
+
+    for statement, executemany in statements:
+        print(f"  {'executemany ' if executemany else ''}{statement}")
+    # The unit of work decides the order (users first), so compare as a set
+    matches = len(statements) == len(expected) and all(
+        any(statement.startswith(prefix) and executemany == many for statement, executemany in statements)
+        for prefix, many in expected
+    )
+    print(f"{len(statements)} statements per warm send (expected {len(expected)}): {'ok' if matches else 'MISMATCH'}")
+    sys.exit(0 if matches else 1)
+
+
+if __name__ == "__main__":
+    main()
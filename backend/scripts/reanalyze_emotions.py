@@ -0,0 +1,89 @@
+"""
+Re-run rule-based emotion detection over stored chat messages.
+
+Recomputes ChatMessage.emotion_detected / sentiment_score for user messages
+after the rules in app.services.emotion_service change. Rows are streamed in
+primary-key order with keyset pagination, so memory stays bounded by
+--chunk-size no matter how large chat_messages is, and each chunk is written
+back with one bulk UPDATE (only rows whose values actually changed).
+
+AI response rows are left alone: they carry the emotion of the user message
+they answered, and EmotionLog rows have no link back to a ChatMessage.
+
+Run from the backend directory:
+    python -m scripts.reanalyze_emotions [--chunk-size 5000] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func, select, update
+
+from app.database import async_session
+from app.models.models import ChatMessage
+from app.services.emotion_service import detect_emotion_batch
+
+
+async def reanalyze(chunk_size: int, dry_run: bool) -> None:
+    user_rows = ChatMessage.is_ai_response.is_(False)
+
+    async with async_session() as db:
+        total = (await db.execute(select(func.count(ChatMessage.id)).where(user_rows))).scalar_one()
+    print(f"Re-analysing {total:,} user messages in chunks of {chunk_size:,}{' (dry run)' if dry_run else ''}")
+
+    processed = changed = 0
+    last_id = None
+    started = time.perf_counter()
+
+    while True:
+        async with async_session() as db:
+            query = (
+                select(ChatMessage.id, ChatMessage.content, ChatMessage.emotion_detected, ChatMessage.sentiment_score)
+                .where(user_rows)
+                .order_by(ChatMessage.id)
+                .limit(chunk_size)
+            )
+            if last_id is not None:
+                query = query.where(ChatMessage.id > last_id)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+
+            results = detect_emotion_batch([row.content for row in rows])
+            updates = [
+                {"id": row.id, "emotion_detected": result.emotion, "sentiment_score": result.sentiment_score}
+                for row, result in zip(rows, results)
+                if (row.emotion_detected, row.sentiment_score) != (result.emotion, result.sentiment_score)
+            ]
+            if updates and not dry_run:
+                await db.execute(update(ChatMessage), updates)
+                await db.commit()
+
+        processed += len(rows)
+        changed += len(updates)
+        last_id = rows[-1].id
+
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed else 0.0
+        remaining = max(total - processed, 0) / rate if rate else 0.0
+        percent = processed / total * 100 if total else 100.0
+        print(
+            f"  {processed:>12,}/{total:,} ({percent:5.1f}%)  changed {changed:,}  "
+            f"{rate:,.0f} rows/s  eta {remaining:,.0f}s"
+        )
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {processed:,} rows scanned, {changed:,} {'would change' if dry_run else 'updated'} in {elapsed:,.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows read and written per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+    asyncio.run(reanalyze(args.chunk_size, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Rebuild or check the per-user emotion counts (user_emotion_counts).
+
+The counts are kept in step with emotion_logs as logs are written; this
+recomputes them from scratch with one GROUP BY, for backfills or after
+editing emotion_logs by hand. With --check nothing is written: every
+(user, emotion) whose stored count differs from emotion_logs is listed and
+the exit status is 1 if there are any.
+
+Queued write-behind logs are not in emotion_logs yet, so run it against a
+stopped server (or one with WRITE_BEHIND_ENABLED off).
+
+Run from the backend directory:
+    python -m scripts.rebuild_emotion_counts [--check]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from app.database import async_session, init_db
+from app.services.emotion_counts import find_count_mismatches, rebuild_emotion_counts
+
+
+async def check() -> int:
+    async with async_session() as db:
+        mismatches = await find_count_mismatches(db)
+    for user_id, emotion, stored, actual in mismatches:
+        print(f"  {user_id}  {emotion:<12} stored {stored:>8,}  actual {actual:>8,}")
+    print(f"{len(mismatches):,} mismatched counts")
+    return 1 if mismatches else 0
+
+
+async def rebuild() -> int:
+    started = time.perf_counter()
+    async with async_session() as db:
+        rows = await rebuild_emotion_counts(db)
+        await db.commit()
+    print(f"Rebuilt {rows:,} emotion counts in {time.perf_counter() - started:,.2f}s")
+    return 0
+
+
+async def run(check_only: bool) -> int:
+    await init_db()
+    return await (check() if check_only else rebuild())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="compare against emotion_logs without writing")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.check)))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,8 +23,11 @@ export default function Layout() {
   useEffect(() => {
     loadQuote();
     checkPending();
-    const interval = setInterval(checkPending, 30000); // Check every 30s
-    return () => clearInterval(interval);
+    // Re-check only when the server says requests changed (EventSource reconnects by itself)
+    const events = connectAPI.openEvents();
+    events.addEventListener('connection_request', checkPending);
+    events.addEventListener('connection_accepted', checkPending);
+    return () => events.close();
   }, []);
 
   // Re-check pending when location changes (e.g. after accepting a request)
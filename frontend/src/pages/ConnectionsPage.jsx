@@ -55,6 +55,36 @@ export default function ConnectionsPage() {
     else if (tab === 'pending') loadPending();
   }, [tab, moodFilter]);
 
+  // Live direct messages over the push socket, reconnecting if it drops
+  const selectedUserRef = useRef(null);
+  useEffect(() => { selectedUserRef.current = selectedUser; }, [selectedUser]);
+
+  useEffect(() => {
+    let socket;
+    let retry;
+    let closed = false;
+    const connect = () => {
+      socket = connectAPI.openSocket();
+      socket.onmessage = (e) => {
+        const event = JSON.parse(e.data);
+        if (event.type !== 'direct_message') return;
+        const msg = event.data;
+        const other = selectedUserRef.current;
+        if (!other || (msg.sender_id !== other.id && msg.receiver_id !== other.id)) return;
+        setMessages((prev) => (prev.some((m) => m.id === msg.id) ? prev : [...prev, msg]));
+      };
+      socket.onclose = () => {
+        if (!closed) retry = setTimeout(connect, 3000);
+      };
+    };
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      socket.close();
+    };
+  }, []);
+
   // Auto-scroll to bottom of chat
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -102,6 +132,7 @@ export default function ConnectionsPage() {
     try {
       const res = await connectAPI.getMessages(u.id);
       setMessages(res.data);
+      if (res.data.some((m) => m.sender_id === u.id && !m.is_read)) connectAPI.markRead(u.id);
     } catch (e) { console.error(e); }
   };
 
@@ -115,7 +146,7 @@ export default function ConnectionsPage() {
         content: finalContent,
         message_type: type
       });
-      setMessages([...messages, res.data]);
+      setMessages((prev) => (prev.some((m) => m.id === res.data.id) ? prev : [...prev, res.data]));
       setMsgInput('');
     } catch (e) { console.error(e); }
   };
@@ -77,17 +77,32 @@ export default function Dashboard() {
       id: tempId, text, isAI: false, time: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
     }]);
 
+    // Render the reply as it streams in, then fill in the saved id and metadata
+    const streamId = tempId + '-ai';
+    let started = false;
     try {
-      const res = await chatAPI.send(text);
-      const ai = res.data.ai_response;
-      setMessages((prev) => [...prev, {
+      const { ai_response: ai } = await chatAPI.stream(text, {
+        onToken: (piece) => {
+          if (!started) {
+            started = true;
+            setMessages((prev) => [...prev, {
+              id: streamId,
+              text: piece,
+              isAI: true,
+              time: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+            }]);
+          } else {
+            setMessages((prev) => prev.map((m) => (m.id === streamId ? { ...m, text: m.text + piece } : m)));
+          }
+        },
+      });
+      setMessages((prev) => prev.map((m) => (m.id === streamId ? {
+        ...m,
         id: ai.id,
         text: ai.content,
-        isAI: true,
         emotion: ai.emotion,
         copingTip: ai.coping_tip,
-        time: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
-      }]);
+      } : m)));
     } catch {
       setMessages((prev) => [...prev, {
         id: tempId + '-err', text: 'Sorry, I had trouble responding. Please try again.', isAI: true,
@@ -37,10 +37,56 @@ export const authAPI = {
   login: (data) => api.post('/auth/login', data),
 };
 
+// --- Chat streaming ---
+// POSTs to /chat/stream and reads its server-sent events. Calls onToken for each
+// piece of reply text and resolves with the `done` payload (same shape as send()).
+const streamChat = async (message, { onToken, onMeta } = {}) => {
+  const token = localStorage.getItem('token');
+  const res = await fetch(`${API_BASE}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({ message }),
+  });
+  if (!res.ok || !res.body) throw new Error(`Chat stream failed (${res.status})`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      let data = '';
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+      const payload = JSON.parse(data);
+      if (event === 'token') onToken?.(payload.text);
+      else if (event === 'meta') onMeta?.(payload);
+      else if (event === 'done') result = payload;
+    }
+  }
+  if (!result) throw new Error('Chat stream ended early');
+  return result;
+};
+
 // --- Chat ---
 export const chatAPI = {
   send: (message) => api.post('/chat/send', { message }),
-  history: (limit = 50, offset = 0) => api.get(`/chat/history?limit=${limit}&offset=${offset}`),
+  stream: streamChat,
+  // Pass { before } / { after } from the X-Before-Cursor / X-After-Cursor headers to page
+  history: (limit = 50, { before, after } = {}) => api.get('/chat/history', { params: { limit, before, after } }),
 };
 
 // --- Profile ---
@@ -51,19 +97,38 @@ export const profileAPI = {
   getEmotions: (limit = 30) => api.get(`/profile/emotions?limit=${limit}`),
   logEmotion: (data) => api.post('/profile/emotions', data),
   emotionSummary: () => api.get('/profile/emotions/summary'),
+  emotionTimeline: (bucket = 'day', days = 30) => api.get('/profile/emotions/timeline', { params: { bucket, days } }),
   userEmotionSummary: (userId) => api.get(`/profile/${userId}/emotions/summary`),
 };
 
 // --- Connections ---
 export const connectAPI = {
-  discover: (mood) => api.get(`/connect/discover${mood ? `?mood=${mood}` : ''}`),
+  // Ranked best first; pass the X-Next-Cursor response header back as cursor for more
+  discover: (mood, cursor) => api.get('/connect/discover', { params: { mood, cursor } }),
+  // Closest emotion profiles first, with a similarity score (0-1)
+  similar: (limit = 10) => api.get('/connect/similar', { params: { limit } }),
   request: (targetUserId) => api.post('/connect/request', { target_user_id: targetUserId }),
   accept: (connectionId) => api.put(`/connect/accept/${connectionId}`),
   myConnections: () => api.get('/connect/my-connections'),
   pending: () => api.get('/connect/pending'),
   sendMessage: (data) => api.post('/connect/messages', data),
-  getMessages: (userId, limit = 50) => api.get(`/connect/messages/${userId}?limit=${limit}`),
+  getMessages: (userId, limit = 50, { before, after } = {}) =>
+    api.get(`/connect/messages/${userId}`, { params: { limit, before, after } }),
   clearMessages: (userId) => api.delete(`/connect/messages/${userId}`),
+  // Conversations, most recent first: { user, last_message, unread_count }
+  inbox: (limit = 50) => api.get('/connect/inbox', { params: { limit } }),
+  markRead: (userId) => api.put(`/connect/messages/${userId}/read`),
+  // Push channel: JSON frames like { type: 'direct_message', data: {...} }
+  openSocket: () => {
+    const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const token = encodeURIComponent(localStorage.getItem('token') || '');
+    return new WebSocket(`${scheme}://${window.location.host}${API_BASE}/connect/ws?token=${token}`);
+  },
+  // Same events as server-sent events: connection_request, connection_accepted, direct_message
+  openEvents: () => {
+    const token = encodeURIComponent(localStorage.getItem('token') || '');
+    return new EventSource(`${API_BASE}/connect/events?token=${token}`);
+  },
 };
 
 // --- Extras ---